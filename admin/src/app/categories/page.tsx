@@ -21,11 +21,12 @@ const CategoryTree = () => {
   const [openCategories, setOpenCategories] = useState<{ [key: number]: boolean }>({});
   const [showModal, setShowModal] = useState(false); // Controlar a visibilidade do modal
   const [newCategoryName, setNewCategoryName] = useState("");
-  const [newCategoryImage, setNewCategoryImage] = useState("");
+  const [newCategoryImage, setNewCategoryImage] = useState<File | null>(null);
   const [parentId, setParentId] = useState<number | null>(null);
 
   useEffect(() => {
-    fetch(`${serverUrl}/categories`)
+    // Leitura autenticada: o servidor responde pelo primário, sem atraso de réplica
+    fetch(`${serverUrl}/categories`, { headers: { "Authorization": `Bearer ${serverToken}` } })
       .then((res) => res.json())
       .then((data) => {
         console.log("Dados recebidos:", data);
@@ -162,8 +163,9 @@ const CategoryTree = () => {
                 <label>
                   Imagem:
                   <input
-                    type="text"
-                    onChange={(e) => setNewCategoryImage(e.target.value)}
+                    type="file"
+                    accept="image/jpeg,image/png,image/webp,image/gif"
+                    onChange={(e) => setNewCategoryImage(e.target.files?.[0] ?? null)}
                     required
                   />
                 </label>
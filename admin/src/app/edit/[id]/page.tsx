@@ -3,7 +3,7 @@
 import styles from './page.module.css';
 import { useEffect, useState, useMemo } from "react";
 import { useParams } from "next/navigation";
-import { getPostById, updatePost, getCategories, getTags, extractCategories } from "@/app/utils/api";
+import { getPostById, updatePost, getCategories, getTags, extractCategories, PostConflictError } from "@/app/utils/api";
 import { LexicalComposer } from "@lexical/react/LexicalComposer";
 import { RichTextPlugin } from "@lexical/react/LexicalRichTextPlugin";
 import { ContentEditable } from "@lexical/react/LexicalContentEditable";
@@ -36,6 +36,7 @@ export default function PageEdit() {
   const [messageClass, setMessageClass] = useState("");
   const [loading, setLoading] = useState(true);
   const [initialContent, setInitialContent] = useState<string | null>(null);
+  const [version, setVersion] = useState<number | undefined>(undefined);
   const [tags, setTags] = useState<Tag[]>([]);
   const [selectedTagOptions, setSelectedTagOptions] = useState<{ [tagId: number]: number }>({});
 
@@ -69,6 +70,7 @@ export default function PageEdit() {
       .then(post => {
         setTitle(post.title);
         setCategoryId(post.category_id);
+        setVersion(post.version);
         // Se post.content já é uma string, use-a; caso contrário, converte para string JSON
         const contentString =
           typeof post.content === "string" ? post.content : JSON.stringify(post.content || {});
@@ -120,17 +122,24 @@ export default function PageEdit() {
     }
     
     try {
-      await updatePost(Number(postId), { 
+      const updated = await updatePost(Number(postId), { 
         title, 
         content: initialContent || "{}", 
         category_id: categoryId,
-        tag_option_ids: Object.values(selectedTagOptions)  // Inclua esse campo!
+        tag_option_ids: Object.values(selectedTagOptions),  // Inclua esse campo!
+        version
       });
+      setVersion(updated.version);
       setMessage("Post atualizado com sucesso!");
       setMessageClass("successMessage");
       // Opcional: se desejar, mantenha ou não as tags selecionadas no estado
       // setSelectedTagOptions({});
     } catch (error) {
+      if (error instanceof PostConflictError) {
+        setMessage(error.message);
+        setMessageClass("errorMessage");
+        return;
+      }
       console.error("Erro ao atualizar post:", error);
       setMessage("Erro ao atualizar o post.");
       setMessageClass("errorMessage");
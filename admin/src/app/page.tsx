@@ -11,7 +11,7 @@ import { faPencil, faEraser } from "@fortawesome/free-solid-svg-icons";
 type Post = {
   id: number;
   title: string;
-  content: string;
+  excerpt: string | null;
 };
 
 export default function Home() {
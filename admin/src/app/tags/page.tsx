@@ -26,7 +26,8 @@ const TagManager = () => {
   const [tagOptions, setTagOptions] = useState<string[]>([]);
 
   useEffect(() => {
-    fetch(`${serverUrl}/tags`)
+    // Leitura autenticada: o servidor responde pelo primário, sem atraso de réplica
+    fetch(`${serverUrl}/tags`, { headers: { "Authorization": `Bearer ${serverToken}` } })
       .then((res) => res.json())
       .then((data: Tag[]) => setTags(data))
       .catch((err) => console.error("Erro ao buscar as tags:", err));
@@ -10,8 +10,13 @@ export interface PostData {
   content: string;
   category_id: number | null;
   tag_option_ids: number[];
+  // Versão lida ao abrir a edição; o servidor recusa (409) se outra edição salvou antes
+  version?: number;
 }
 
+// O post mudou desde que foi carregado (resposta 409 do PUT)
+export class PostConflictError extends Error {}
+
 export interface CategoryOption {
   id: number;
   name: string;
@@ -32,6 +37,10 @@ export interface Tag {
 const serverUrl = process.env.NEXT_PUBLIC_SERVER_URL 
 const serverToken = process.env.NEXT_PUBLIC_AUTH_TOKEN
 
+// Leituras do painel vão autenticadas: o servidor as responde pelo banco primário,
+// então o admin vê na hora o que acabou de salvar mesmo com réplicas de leitura
+const authHeaders = () => ({ "Authorization": `Bearer ${serverToken}` });
+
 
 export async function createPost(postData: PostData) {
   const response = await fetch(`${serverUrl}/posts`, {
@@ -52,18 +61,29 @@ export async function createPost(postData: PostData) {
   return await response.json();
 }
 
+// O painel lista todos os posts, então percorre as páginas pelo cursor
 export const getPosts = async () => {
-  const response = await fetch(`${serverUrl}/posts`);
+  const posts = [];
+  let after: number | null = null;
 
-  if (!response.ok) {
-    throw new Error("Erro ao buscar posts");
-  }
+  do {
+    const query: string = after === null ? "" : `&after=${after}`;
+    const response = await fetch(`${serverUrl}/posts?limit=100${query}`, { headers: authHeaders() });
 
-  return await response.json();
+    if (!response.ok) {
+      throw new Error("Erro ao buscar posts");
+    }
+
+    const page = await response.json();
+    posts.push(...page.items);
+    after = page.next_cursor;
+  } while (after !== null);
+
+  return posts;
 };
 
 export const getPostById = async (id: string) => {
-  const response = await fetch(`${serverUrl}/posts/${id}`);
+  const response = await fetch(`${serverUrl}/posts/${id}`, { headers: authHeaders() });
 
   if (!response.ok) {
     throw new Error("Erro ao buscar post");
@@ -83,6 +103,11 @@ export async function updatePost(postId: number, updatedData: Partial<PostData>)
       body: JSON.stringify(updatedData),
     });
 
+    if (response.status === 409) {
+      const { detail } = await response.json();
+      throw new PostConflictError(detail);
+    }
+
     if (!response.ok) {
       const errorText = await response.text();
       throw new Error(`Erro ao atualizar post: ${response.status} - ${errorText}`);
@@ -111,7 +136,7 @@ export async function deletePost(id: string) {
 }
 
 export const getCategories = async (): Promise<Category[]> => {
-  const response = await fetch(`${serverUrl}/categories`);
+  const response = await fetch(`${serverUrl}/categories`, { headers: authHeaders() });
 
   if (!response.ok) {
     throw new Error("Erro ao buscar categorias");
@@ -137,7 +162,7 @@ export const extractCategories = (categories: Category[], prefix = ""): { id: nu
 };
 
 export async function getTags(): Promise<Tag[]> {
-  const res = await fetch(`${serverUrl}/tags`);
+  const res = await fetch(`${serverUrl}/tags`, { headers: authHeaders() });
   if (!res.ok) {
     throw new Error("Erro ao buscar tags");
   }
@@ -1,7 +1,19 @@
 import type { NextConfig } from "next";
 
+// Imagens das categorias servidas pelo backend em /images (nomes com hash, cache imutável)
+const serverUrl = process.env.NEXT_PUBLIC_SERVER_URL ? new URL(process.env.NEXT_PUBLIC_SERVER_URL) : null;
+
 const nextConfig: NextConfig = {
-  /* config options here */
+  images: {
+    remotePatterns: serverUrl
+      ? [{
+          protocol: serverUrl.protocol.replace(":", "") as "http" | "https",
+          hostname: serverUrl.hostname,
+          port: serverUrl.port,
+          pathname: "/images/**",
+        }]
+      : [],
+  },
 };
 
 export default nextConfig;
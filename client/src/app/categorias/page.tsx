@@ -1,19 +1,22 @@
 "use client";
 
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import styles from './page.module.css';
 import Link from "next/link";
-import { Post, Category } from "../utils/api";
+import { PostSummary, PostPage, Category, categoryImageUrl } from "../utils/api";
 
 const serverUrl = process.env.NEXT_PUBLIC_SERVER_URL
 
 const CategoryTree = () => {
-  const [posts, setPosts] = useState<Post[]>([]);
+  const [posts, setPosts] = useState<PostSummary[]>([]);
   const [categories, setCategories] = useState<Category[]>([]);
   const [selectedCategories, setSelectedCategories] = useState<Set<number>>(new Set());
   const [selectAllText, setSelectAllText] = useState("Selecionar todas");
-  const [currentPage, setCurrentPage] = useState(1); 
-  const postsPerPage = 9; 
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
+  const [loading, setLoading] = useState(false);
+  // Identifica a busca atual: resposta de uma seleção anterior é descartada
+  const requestId = useRef(0);
+  const postsPerPage = 9;
 
   useEffect(() => {
     fetch(`${serverUrl}/categories`)
@@ -25,18 +28,39 @@ const CategoryTree = () => {
       .catch((err) => console.error("Erro ao buscar as categorias:", err));
   }, []);
 
+  // Busca uma página de posts das categorias selecionadas, a partir do cursor
+  const fetchPosts = async (after: number | null) => {
+    const current = ++requestId.current;
+    setLoading(true);
+    try {
+      const params = new URLSearchParams({ limit: String(postsPerPage) });
+      selectedCategories.forEach((id) => params.append("categories", String(id)));
+      if (after !== null) params.set("after", String(after));
+
+      const response = await fetch(`${serverUrl}/posts?${params}`);
+      if (!response.ok) {
+        throw new Error("Erro ao buscar posts");
+      }
+      const data: PostPage = await response.json();
+      if (current !== requestId.current) return;
+      setPosts((prev) => (after === null ? data.items : [...prev, ...data.items]));
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      console.error("Erro ao buscar posts:", err);
+    } finally {
+      if (current === requestId.current) setLoading(false);
+    }
+  };
+
+  // Recomeça da primeira página sempre que a seleção muda
   useEffect(() => {
     if (selectedCategories.size > 0) {
-      const categoryIds = Array.from(selectedCategories).join("&categories=");
-      fetch(`${serverUrl}/posts?categories=${categoryIds}`)
-        .then((res) => res.json())
-        .then((data) => {
-          console.log("Posts recebidos:", data);
-          setPosts(data.reverse());
-        })
-        .catch((err) => console.error("Erro ao buscar posts:", err));
+      fetchPosts(null);
     } else {
+      requestId.current++;
       setPosts([]);
+      setNextCursor(null);
+      setLoading(false);
     }
   }, [selectedCategories]);
 
@@ -65,16 +89,6 @@ const CategoryTree = () => {
     }
   };
 
-  const paginate = (pageNumber: number) => {
-    setCurrentPage(pageNumber);
-  };
-
-  const indexOfLastPost = currentPage * postsPerPage;
-  const indexOfFirstPost = indexOfLastPost - postsPerPage;
-  const currentPosts = posts.slice(indexOfFirstPost, indexOfLastPost);
-
-  const totalPages = Math.ceil(posts.length / postsPerPage);
-
   const getCategoryName = (categoryId: number): string => {
     const findCategoryName = (categories: Category[], categoryId: number): string => {
       for (const category of categories) {
@@ -95,8 +109,7 @@ const CategoryTree = () => {
     const findCategoryImage = (categories: Category[], categoryId: number): string | null => {
       for (const category of categories) {
         if (category.id === categoryId) {
-          console.log("retorno da category", category.image_url)
-          return category.image_url?.startsWith('/img') ? category.image_url : `/img/${category.image_url}` || null;
+          return categoryImageUrl(category, 640);
         }
         const subcategoryImage = findCategoryImage(category.subcategories, categoryId);
         if (subcategoryImage) {
@@ -150,7 +163,7 @@ const CategoryTree = () => {
           {selectedCategories.size > 0 ? (
             posts.length > 0 ? (
               <div className={styles.cards}>
-                {currentPosts.map((post) => (
+                {posts.map((post) => (
                   <Link href={`/posts/${post.id}`} key={post.id} className={styles.postCard}>
                     <div 
                     className={styles.cardInfo}
@@ -166,6 +179,8 @@ const CategoryTree = () => {
                   </Link>
                 ))}
               </div>
+            ) : loading ? (
+              <p className={styles.textFound}>Carregando posts...</p>
             ) : (
               <p className={styles.textFound}>Nenhum post encontrado para essas categorias.</p>
             )
@@ -178,15 +193,11 @@ const CategoryTree = () => {
 
       <p className="sep-line center">______________________________________________________________________</p>
       <div className={styles.pagination}>
-        {Array.from({ length: totalPages }, (_, index) => (
-          <button
-            key={index + 1}
-            onClick={() => paginate(index + 1)}
-            className={currentPage === index + 1 ? "active" : ""}
-          >
-            {index + 1}
+        {nextCursor !== null && (
+          <button onClick={() => fetchPosts(nextCursor)} disabled={loading}>
+            Carregar mais
           </button>
-        ))}
+        )}
       </div>
 
     </main>
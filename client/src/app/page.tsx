@@ -6,12 +6,12 @@ import { FontAwesomeIcon } from '@fortawesome/react-fontawesome';
 import { faSearch } from '@fortawesome/free-solid-svg-icons';
 import Link from "next/link";
 import { useRouter } from 'next/navigation';
-import { Post, Category } from "../app/utils/api";
+import { PostSummary, PostPage, Category, categoryImageUrl } from "../app/utils/api";
 
 const serverUrl = process.env.NEXT_PUBLIC_SERVER_URL
 
 export default function Home() {
-  const [posts, setPosts] = useState<Post[]>([]);
+  const [posts, setPosts] = useState<PostSummary[]>([]);
   const [categories, setCategories] = useState<Category[]>([]);
   const [searchQuery, setSearchQuery] = useState(""); // Guarda a pesquisa
   const [loading, setLoading] = useState(false);
@@ -35,15 +35,13 @@ export default function Home() {
   const fetchPosts = async () => {
     setLoading(true);
     try {
-      const response = await fetch(`${serverUrl}/posts`);
+      // O servidor já devolve os posts do mais novo para o mais antigo
+      const response = await fetch(`${serverUrl}/posts?limit=4`);
       if (!response.ok) {
         throw new Error("Erro ao buscar posts");
       }
-      const data = await response.json();
-      // Ordena os posts por ID de forma decrescente
-      const sortedPosts = data.sort((a: Post, b: Post) => b.id - a.id);
-      // Exibe os últimos 4 posts (ou quantos desejar)
-      setPosts(sortedPosts.slice(0, 4));
+      const data: PostPage = await response.json();
+      setPosts(data.items);
     } catch (error) {
       console.error("Erro ao carregar os posts:", error);
     } finally {
@@ -72,9 +70,7 @@ export default function Home() {
     const findCategoryImage = (categories: Category[], categoryId: number): string | null => {
       for (const category of categories) {
         if (category.id === categoryId) {
-          return category.image_url?.startsWith('/img')
-            ? category.image_url
-            : `/img/${category.image_url}` || null;
+          return categoryImageUrl(category, 640);
         }
         const subcategoryImage = findCategoryImage(category.subcategories, categoryId);
         if (subcategoryImage) {
@@ -2,8 +2,7 @@
 
 import { useEffect, useState } from "react";
 import { useParams } from "next/navigation";
-import { getPostById, Post, Category } from "../../utils/api";
-import LexicalEditor from "../../components/LexicalEditor";
+import { getPostById, Post, Category, categoryImageUrl } from "../../utils/api";
 import styles from "./page.module.css";
 import Image from "next/image";
 
@@ -14,7 +13,7 @@ export default function ViewPost() {
   const postId = params?.postId as string;
 
   const [categories, setCategories] = useState<Category[]>([]);
-  const [content, setContent] = useState<string | object>(""); 
+  const [contentHtml, setContentHtml] = useState<string>("");
   const [title, setTitle] = useState<string>("");
   const [categoryId, setCategoryId] = useState<number | null>(null);
   // Novo estado para as tags do post
@@ -55,9 +54,7 @@ export default function ViewPost() {
     const findCategoryImage = (categories: Category[], categoryId: number): string | null => {
       for (const category of categories) {
         if (category.id === categoryId) {
-          return category.image_url?.startsWith('/img')
-            ? category.image_url
-            : `/img/${category.image_url}` || null;
+          return categoryImageUrl(category, 1280);
         }
         const subcategoryImage = findCategoryImage(category.subcategories, categoryId);
         if (subcategoryImage) {
@@ -76,27 +73,15 @@ export default function ViewPost() {
   useEffect(() => {
     if (!postId) return;
 
-    getPostById(postId)
+    // O servidor já manda o HTML renderizado: nada de montar o editor só para exibir
+    getPostById(postId, "html")
       .then((data: Post | null) => {
         if (data) {
-          console.log("Post encontrado:", data);
           setTitle(data.title);
           setCategoryId(data.category_id);
           // Se a API retornar as tags associadas ao post, atualize o estado:
           setPostTags(data.tag_options || []);
-          
-          try {
-            let parsedContent = data.content;
-            if (typeof parsedContent === "string") {
-              console.log("Conteúdo antes do parse:", parsedContent);
-              parsedContent = JSON.parse(parsedContent);              
-              console.log("Conteúdo depois do parse:", parsedContent);
-            }
-            setContent(parsedContent);
-          } catch (error) {
-            console.error("Erro ao converter JSON para estado do editor:", error);
-            setContent("");
-          }
+          setContentHtml(data.content);
         }
       })
       .catch((err) => console.error("Erro ao buscar post:", err));
@@ -132,10 +117,10 @@ export default function ViewPost() {
       </div>
 
       <div className={styles.contentBox}>
-        <LexicalEditor 
+        {/* HTML sanitizado no servidor (lexical.render_html) */}
+        <div
           className={styles.content}
-          content={typeof content === "string" ? content : JSON.stringify(content)}
-          readOnly={true} 
+          dangerouslySetInnerHTML={{ __html: contentHtml }}
         />
       </div>
     </main>
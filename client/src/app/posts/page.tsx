@@ -6,19 +6,18 @@ import Link from "next/link";
 import { useSearchParams, useRouter } from "next/navigation";
 import { FontAwesomeIcon } from "@fortawesome/react-fontawesome";
 import { faSearch } from "@fortawesome/free-solid-svg-icons";
-import { Post, Category } from "../utils/api";
+import { PostSummary, PostPage, Category, categoryImageUrl } from "../utils/api";
 
 const serverUrl = process.env.NEXT_PUBLIC_SERVER_URL
 
 function PostsContent() {
-  const [allPosts, setAllPosts] = useState<Post[]>([]);
-  const [posts, setPosts] = useState<Post[]>([]);
+  const [posts, setPosts] = useState<PostSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
   const [categories, setCategories] = useState<Category[]>([]);
   const [loading, setLoading] = useState(false);
   const searchParams = useSearchParams();
   const [searchQuery, setSearchQuery] = useState(""); // Para a UI
   const query = searchParams.get("q") || "";
-  const [currentPage, setCurrentPage] = useState(1);
   const postsPerPage = 8;
   const router = useRouter();
 
@@ -36,18 +35,21 @@ function PostsContent() {
     }
   };
 
-  // Busca os posts (executada uma vez)
-  const fetchPosts = async () => {
+  // Busca uma página de posts; a busca é feita no servidor
+  const fetchPosts = async (after: number | null) => {
     setLoading(true);
     try {
-      const response = await fetch(`${serverUrl}/posts`);
+      const params = new URLSearchParams({ limit: String(postsPerPage) });
+      if (query) params.set("search", query);
+      if (after !== null) params.set("after", String(after));
+
+      const response = await fetch(`${serverUrl}/posts?${params}`);
       if (!response.ok) {
         throw new Error("Erro ao buscar posts");
       }
-      const data = await response.json();
-      const sortedPosts = data.sort((a: Post, b: Post) => b.id - a.id);
-      setAllPosts(sortedPosts);
-      setPosts(sortedPosts); // Exibe todos ou, se preferir, os últimos posts
+      const data: PostPage = await response.json();
+      setPosts((prev) => (after === null ? data.items : [...prev, ...data.items]));
+      setNextCursor(data.next_cursor);
     } catch (error) {
       console.error("Erro ao carregar os posts:", error);
     } finally {
@@ -55,62 +57,14 @@ function PostsContent() {
     }
   };
 
-  // Executa a busca dos dados uma única vez
   useEffect(() => {
     fetchCategories();
-    fetchPosts();
   }, []);
 
-  // Efeito para filtrar os posts já buscados, sempre que a query, as categorias ou os posts mudarem
+  // Recomeça da primeira página sempre que a pesquisa muda
   useEffect(() => {
-    if (query) {
-      // Função que percorre a árvore de categorias e retorna os IDs que batem com a query
-      const getMatchingCategoryIds = (
-        categories: Category[],
-        query: string
-      ): Set<number> => {
-        const matchingIds = new Set<number>();
-        const checkCategory = (cat: Category, ancestorMatched: boolean) => {
-          const currentMatched =
-            ancestorMatched || cat.name.toLowerCase().includes(query.toLowerCase());
-          if (currentMatched) {
-            matchingIds.add(cat.id);
-          }
-          cat.subcategories.forEach((sub) => checkCategory(sub, currentMatched));
-        };
-        categories.forEach((cat) => checkCategory(cat, false));
-        return matchingIds;
-      };
-
-      const matchingCategoryIds = getMatchingCategoryIds(categories, query);
-
-      const filteredPosts = allPosts.filter((post: Post) => {
-        const postContent = JSON.parse(post.content).root.children
-          .map((child: { children?: { text: string }[] }) =>
-            child.children?.map((c) => c.text).join(" ") || ""
-          )
-          .join(" ");
-
-        const titleMatch = post.title.toLowerCase().includes(query.toLowerCase());
-        const contentMatch = postContent.toLowerCase().includes(query.toLowerCase());
-        const categoryMatch = matchingCategoryIds.has(post.category_id);
-
-        return titleMatch || contentMatch || categoryMatch;
-      });
-
-      setPosts(filteredPosts);
-      setCurrentPage(1); // Reseta para a página 1 ao filtrar
-    } else {
-      // Se não houver query, exibe todos os posts (ou os últimos)
-      setPosts(allPosts);
-    }
-  }, [query, categories, allPosts]);
-
-  // Paginação
-  const paginate = (pageNumber: number) => setCurrentPage(pageNumber);
-  const indexOfLastPost = currentPage * postsPerPage;
-  const indexOfFirstPost = indexOfLastPost - postsPerPage;
-  const currentPosts = posts.slice(indexOfFirstPost, indexOfLastPost);
+    fetchPosts(null);
+  }, [query]);
 
   // Função para obter o nome da categoria (percorrendo a árvore)
   const getCategoryName = (categoryId: number): string => {
@@ -129,9 +83,7 @@ function PostsContent() {
     const findCategoryImage = (categories: Category[], categoryId: number): string | null => {
       for (const category of categories) {
         if (category.id === categoryId) {
-          return category.image_url?.startsWith("/img")
-            ? category.image_url
-            : `/img/${category.image_url}` || null;
+          return categoryImageUrl(category, 640);
         }
         const subcategoryImage = findCategoryImage(category.subcategories, categoryId);
         if (subcategoryImage) return subcategoryImage;
@@ -148,8 +100,6 @@ function PostsContent() {
     }
   };
 
-  const totalPages = Math.ceil(posts.length / postsPerPage);
-
   return (
     <main className={styles.main}>
       <div className={styles.searchTab}>
@@ -171,7 +121,7 @@ function PostsContent() {
 
       <div className={styles.cards}>
         {loading && <div>Carregando posts...</div>}
-        {currentPosts.map((post) => (
+        {posts.map((post) => (
           <Link href={`/posts/${post.id}`} key={post.id} className={styles.postCard}>
             <div
               className={styles.cardInfo}
@@ -190,15 +140,11 @@ function PostsContent() {
       <p className="sep-line center">______________________________________________________________________</p>
 
       <div className={styles.pagination}>
-        {Array.from({ length: totalPages }, (_, index) => (
-          <button
-            key={index + 1}
-            onClick={() => paginate(index + 1)}
-            className={currentPage === index + 1 ? "active" : ""}
-          >
-            {index + 1}
+        {nextCursor !== null && (
+          <button onClick={() => fetchPosts(nextCursor)} disabled={loading}>
+            Carregar mais
           </button>
-        ))}
+        )}
       </div>
     </main>
   );
@@ -12,18 +12,55 @@ export interface Post {
   tag_options: TagOption[];
 }
 
+export interface PostSummary {
+  id: number;
+  title: string;
+  category_id: number;
+  excerpt: string | null;
+  category: { id: number; name: string; parent_id: number | null; image_url: string | null; image_webp_srcset: string | null } | null;
+  tag_options: { id: number; name: string; tag_type_id: number }[];
+}
+
+export interface PostPage {
+  items: PostSummary[];
+  next_cursor: number | null;
+}
+
 export interface Category {
   id: number;
   name: string;
   image_url: string;
+  // Variantes redimensionadas ("url 320w, url 640w, ..."), vazias enquanto o servidor processa a imagem
+  image_srcset: string | null;
+  image_webp_srcset: string | null;
   subcategories: Category[];
 }
 
 const serverUrl = process.env.NEXT_PUBLIC_SERVER_URL
 
-export async function getPostById(postId: string): Promise<Post | null> {
+// Imagens enviadas pelo painel ficam no servidor (/images); as antigas, em /img do próprio site
+function imageUrl(url: string): string {
+  if (url.startsWith("/images/")) return `${serverUrl}${url}`;
+  return url.startsWith("/img") || url.startsWith("http") ? url : `/img/${url}`;
+}
+
+// Menor variante WebP com pelo menos `width` px (a maior, se nenhuma chegar lá); sem variantes, a original
+export function categoryImageUrl(category: Pick<Category, "image_url" | "image_webp_srcset">, width: number): string | null {
+  if (category.image_webp_srcset) {
+    const variants = category.image_webp_srcset.split(",").map(entry => {
+      const [url, descriptor] = entry.trim().split(/\s+/);
+      return { url, width: parseInt(descriptor) };
+    });
+    const chosen = variants.find(variant => variant.width >= width) ?? variants[variants.length - 1];
+    return imageUrl(chosen.url);
+  }
+  return category.image_url ? imageUrl(category.image_url) : null;
+}
+
+// format=html devolve o conteúdo já renderizado (HTML sanitizado) pelo servidor
+export async function getPostById(postId: string, format: "lexical" | "html" | "text" = "lexical"): Promise<Post | null> {
   try {
-    const response = await fetch(`${serverUrl}/posts/${postId}`);
+    const response = await fetch(`${serverUrl}/posts/${postId}?format=${format}`);
     if (!response.ok) throw new Error(`Erro ${response.status}`);
     return await response.json();
   } catch (error) {
@@ -0,0 +1,60 @@
+import hmac
+import logging
+import os
+from typing import Optional
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Lido uma vez só, na importação (antes era um os.getenv a cada requisição). O .env já foi
+# carregado pelo database, que importa este módulo
+AUTH_TOKEN = os.getenv("AUTH_TOKEN", "")
+
+# Métodos que exigem o token do admin; leituras passam direto
+PROTECTED_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+def _extract_token(auth_header: str) -> str:
+    # Espera-se o formato "Bearer <token>", mas o token puro também é aceito
+    if "Bearer " in auth_header:
+        return auth_header.split("Bearer ", 1)[1]
+    return auth_header
+
+
+def is_authorized(auth_header: Optional[str], expected: Optional[str] = None) -> bool:
+    expected = AUTH_TOKEN if expected is None else expected
+    if not auth_header or not expected:
+        return False
+    # Comparação em tempo constante: não vaza quantos caracteres do token estavam certos
+    return hmac.compare_digest(_extract_token(auth_header).encode(), expected.encode())
+
+
+class AuthMiddleware:
+    """
+    Exige o token do admin em POST/PUT/PATCH/DELETE. Middleware ASGI puro: GETs seguem sem
+    custo extra e as recusas saem como 401/403 em JSON, com o mesmo formato das HTTPException.
+    """
+
+    def __init__(self, app, token: Optional[str] = None):
+        self.app = app
+        self.token = AUTH_TOKEN if token is None else token
+        if not self.token:
+            logger.warning("AUTH_TOKEN não definido: todas as escritas serão recusadas")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in PROTECTED_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        auth_header = Headers(scope=scope).get("authorization")
+        if not auth_header:
+            response = JSONResponse({"detail": "Token não fornecido"}, status_code=401,
+                                    headers={"WWW-Authenticate": "Bearer"})
+        elif not is_authorized(auth_header, self.token):
+            response = JSONResponse({"detail": "Token inválido"}, status_code=403)
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        await response(scope, receive, send)
@@ -0,0 +1,322 @@
+import asyncio
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterable, NamedTuple, Optional
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import redis
+except ImportError:  # o Redis é opcional: sem ele só existe o cache em memória
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Tempo máximo que um valor fica em cache. Sem Redis cada worker tem o seu cache, então a
+# invalidação só vale para o processo que fez a escrita; o TTL garante que os
+# outros workers também enxerguem a mudança.
+DEFAULT_TTL = float(os.getenv("CACHE_TTL", "60"))
+# Quantidade máxima de entradas em memória por worker (as menos usadas saem primeiro)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+# Camada compartilhada entre workers (ex.: redis://localhost:6379/0). Vazio = só memória.
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+# Por quanto tempo depois de uma escrita as leituras de uma tag vão ao primário ao carregar:
+# uma réplica atrasada devolveria as linhas antigas, guardadas sob a geração nova até o TTL.
+# Deve cobrir o atraso de replicação esperado.
+CACHE_PRIMARY_AFTER_WRITE = float(os.getenv("CACHE_PRIMARY_AFTER_WRITE", "5"))
+
+# Ligado enquanto o loader roda para uma tag recém-escrita (lido por database.ReadSession)
+_primary_reads: ContextVar[bool] = ContextVar("cache_primary_reads", default=False)
+
+
+class Payload(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: Optional[Any] = None
+
+
+class _Entry(NamedTuple):
+    value: Any
+    generations: tuple
+
+
+#! ------------------------- CAMADAS -------------------------
+class MemoryBackend:
+    # LRU com TTL, em memória. Também serve de camada compartilhada falsa em testes.
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._store: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._bumped_at: dict[str, float] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._store[key]
+                return None
+            self._store.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float = DEFAULT_TTL):
+        with self._lock:
+            self._store[key] = (time.monotonic() + ttl, value)
+            self._store.move_to_end(key)
+            while len(self._store) > self.max_entries:
+                self._store.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._store.pop(key, None)
+
+    def generations(self, tags: Iterable[str]) -> tuple:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def bump(self, *tags: str):
+        with self._lock:
+            now = time.monotonic()
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                self._bumped_at[tag] = now
+
+    def bumped_recently(self, tags: Iterable[str], seconds: float = CACHE_PRIMARY_AFTER_WRITE) -> bool:
+        since = time.monotonic() - seconds
+        return any(self._bumped_at.get(tag, float("-inf")) > since for tag in tags)
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+            self._generations.clear()
+            self._bumped_at.clear()
+
+
+class RedisBackend:
+    # Camada compartilhada entre workers. Falhas do Redis nunca derrubam a leitura:
+    # o valor simplesmente vem do banco.
+
+    def __init__(self, url: str, prefix: str = "rapydo:cache:"):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = self.client.get(self.prefix + key)
+        except redis.RedisError:
+            logger.warning("Cache: Redis indisponível na leitura de %s", key)
+            return None
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: float = DEFAULT_TTL):
+        try:
+            self.client.set(self.prefix + key, pickle.dumps(value), px=int(ttl * 1000))
+        except redis.RedisError:
+            logger.warning("Cache: Redis indisponível na escrita de %s", key)
+
+    def delete(self, *keys: str):
+        try:
+            self.client.delete(*(self.prefix + key for key in keys))
+        except redis.RedisError:
+            logger.warning("Cache: Redis indisponível ao apagar %s", keys)
+
+    def generations(self, tags: Iterable[str]) -> Optional[tuple]:
+        tags = list(tags)
+        if not tags:
+            return ()
+        try:
+            values = self.client.mget([f"{self.prefix}tag:{tag}" for tag in tags])
+        except redis.RedisError:
+            return None
+        return tuple(int(value or 0) for value in values)
+
+    def bump(self, *tags: str):
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    pipe.incr(f"{self.prefix}tag:{tag}")
+                    # Marca de escrita recente, que expira sozinha (bumped_recently)
+                    if CACHE_PRIMARY_AFTER_WRITE > 0:
+                        pipe.set(f"{self.prefix}written:{tag}", 1, px=int(CACHE_PRIMARY_AFTER_WRITE * 1000))
+                pipe.execute()
+        except redis.RedisError:
+            logger.warning("Cache: Redis indisponível ao invalidar %s", tags)
+
+    def bumped_recently(self, tags: Iterable[str], seconds: float = CACHE_PRIMARY_AFTER_WRITE) -> bool:
+        # A janela é a do TTL da marca gravada em bump; na falha do Redis, por segurança, sim
+        tags = list(tags)
+        if not tags:
+            return False
+        try:
+            return self.client.exists(*(f"{self.prefix}written:{tag}" for tag in tags)) > 0
+        except redis.RedisError:
+            return True
+
+    def clear(self):
+        pass
+
+
+#! ------------------------- CACHE -------------------------
+class TieredCache:
+    """
+    Cache em duas camadas (memória do worker + compartilhada opcional) com invalidação por tags.
+    Cada tag tem um contador de geração; a entrada guarda as gerações das suas tags no momento
+    em que foi carregada e deixa de valer assim que alguma delas é incrementada. Sem a camada
+    compartilhada as gerações são do worker: os outros só enxergam a escrita quando o TTL vence.
+    Logo depois de uma escrita (CACHE_PRIMARY_AFTER_WRITE) o loader lê do primário, para uma
+    réplica atrasada não gravar a versão antiga sob a geração nova.
+    """
+
+    def __init__(self, local: MemoryBackend, shared=None):
+        self.local = local
+        self.shared = shared
+        self._inflight: dict[str, asyncio.Future] = {}
+        # Invalidações no Redis disparadas do event loop e ainda em andamento
+        self._bumps: set[asyncio.Future] = set()
+
+    async def _generations(self, tags: tuple) -> Optional[tuple]:
+        if self.shared is None:
+            return self.local.generations(tags)
+        if self._bumps:
+            # Uma escrita deste worker ainda invalidando: espera para não ler a geração antiga
+            await asyncio.gather(*self._bumps, return_exceptions=True)
+        return await run_in_threadpool(self.shared.generations, tags)
+
+    async def _recently_written(self, tags: tuple) -> bool:
+        if CACHE_PRIMARY_AFTER_WRITE <= 0 or not tags:
+            return False
+        if self.local.bumped_recently(tags):
+            return True
+        return self.shared is not None and await run_in_threadpool(self.shared.bumped_recently, tags)
+
+    async def _load(self, loader: Callable[[], Awaitable[Any]], tags: tuple) -> Any:
+        token = _primary_reads.set(True) if await self._recently_written(tags) else None
+        try:
+            return await loader()
+        finally:
+            if token is not None:
+                _primary_reads.reset(token)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]],
+                          tags: Iterable[str] = (), ttl: float = DEFAULT_TTL, refresh: bool = False) -> Any:
+        # refresh=True ignora o que está guardado, carrega do banco e atualiza o cache
+        tags = tuple(tags)
+        # As gerações são lidas antes de carregar: uma escrita no meio do caminho invalida o resultado
+        generations = await self._generations(tags)
+        if generations is None:
+            return await self._load(loader, tags)
+
+        entry = None if refresh else self.local.get(key)
+        if entry is not None and entry.generations == generations:
+            return entry.value
+
+        if self.shared is not None and not refresh:
+            entry = await run_in_threadpool(self.shared.get, key)
+            if entry is not None and entry.generations == generations:
+                self.local.set(key, entry, ttl)
+                return entry.value
+
+        # Coalescência: com várias requisições pedindo a mesma chave, só a primeira vai ao banco
+        inflight_key = f"{key}|{generations}"
+        pending = None if refresh else self._inflight.get(inflight_key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Quem carregava foi cancelado (cliente desconectou): esta requisição não tem
+                # nada com isso e carrega de novo. Se o cancelamento é desta, propaga
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                return await self.get_or_load(key, loader, tags, ttl, refresh)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight.setdefault(inflight_key, future)
+        try:
+            value = await self._load(loader, tags)
+        except Exception as error:
+            future.set_exception(error)
+            # Marca a exceção como lida (pode não haver ninguém esperando)
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            if self._inflight.get(inflight_key) is future:
+                del self._inflight[inflight_key]
+            if not future.done():
+                future.cancel()
+
+        entry = _Entry(value, generations)
+        self.local.set(key, entry, ttl)
+        if self.shared is not None:
+            await run_in_threadpool(self.shared.set, key, entry, ttl)
+        return value
+
+    def invalidate_tags(self, *tags: str):
+        # Chamado depois do commit das escritas (síncrono: roda no mesmo contexto do crud)
+        if not tags:
+            return
+        self.local.bump(*tags)
+        if self.shared is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Fora do event loop (crud síncrono, já no threadpool): pode bloquear
+            self.shared.bump(*tags)
+            return
+        # No event loop (DB_ASYNC): a chamada ao Redis vai para uma thread
+        bump = loop.run_in_executor(None, self.shared.bump, *tags)
+        self._bumps.add(bump)
+        bump.add_done_callback(self._bumps.discard)
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+
+def _default_cache() -> TieredCache:
+    shared = None
+    if CACHE_REDIS_URL:
+        if redis is None:
+            logger.warning("CACHE_REDIS_URL definido, mas o pacote redis não está instalado; usando só memória")
+        else:
+            shared = RedisBackend(CACHE_REDIS_URL)
+    return TieredCache(MemoryBackend(), shared)
+
+
+_cache = _default_cache()
+
+
+def configure(local: Optional[MemoryBackend] = None, shared=None) -> TieredCache:
+    # Troca as camadas do cache (ex.: MemoryBackend no lugar do Redis em testes)
+    global _cache
+    _cache = TieredCache(local or MemoryBackend(), shared)
+    return _cache
+
+
+async def get_or_load(key: str, loader: Callable[[], Awaitable[Any]],
+                      tags: Iterable[str] = (), ttl: float = DEFAULT_TTL, refresh: bool = False) -> Any:
+    return await _cache.get_or_load(key, loader, tags, ttl, refresh)
+
+
+def invalidate_tags(*tags: str):
+    _cache.invalidate_tags(*tags)
+
+
+def primary_reads() -> bool:
+    # O loader em andamento precisa ler do primário (tag escrita há pouco)?
+    return _primary_reads.get()
+
+
+def clear():
+    _cache.clear()
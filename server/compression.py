@@ -0,0 +1,160 @@
+import os
+import zlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele só gzip é oferecido
+    brotli = None
+
+# Respostas menores que isso vão sem compressão (o ganho não paga o custo)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+# Qualidade baixa/média: comprime quase tanto quanto a máxima e é muito mais rápida
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+    "text/",
+)
+# Eventos precisam chegar na hora; um proxy de compressão segura o buffer
+_EXCLUDED_TYPES = ("text/event-stream",)
+
+
+def _accepted_encodings(accept_encoding: str) -> dict[str, float]:
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def _weak(etag: Optional[str]) -> Optional[str]:
+    return etag if etag is None or etag.startswith("W/") else "W/" + etag
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    # Prefere brotli quando o cliente aceita e o módulo está instalado; senão gzip
+    accepted = _accepted_encodings(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            # wbits=31: formato gzip (cabeçalho + CRC), não o deflate puro
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        # Flush a cada pedaço: respostas em streaming chegam ao cliente sem esperar o fim
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compressão gzip/brotli negociada pelo Accept-Encoding, como middleware ASGI puro.
+    Só comprime tipos textuais acima de COMPRESSION_MIN_SIZE; respostas em streaming
+    são comprimidas pedaço a pedaço. O ETag da resposta comprimida vira fraco (W/): os bytes
+    não são os da representação original, que continua com o ETag forte.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                # Segura o início até ver o primeiro pedaço do corpo
+                start_message = message
+                headers = MutableHeaders(raw=message["headers"])
+                if message["status"] == 304 and "etag" in headers and \
+                        _weak(headers["etag"]) in request_headers.get("if-none-match", ""):
+                    # O cliente validou a versão comprimida: o 304 repete o ETag que ele tem
+                    headers["etag"] = _weak(headers["etag"])
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                content_type = headers.get("content-type", "").lower()
+                compressible = content_type.startswith(_COMPRESSIBLE_TYPES) and not content_type.startswith(_EXCLUDED_TYPES)
+
+                if compressible and "accept-encoding" not in headers.get("vary", "").lower():
+                    headers.add_vary_header("Accept-Encoding")
+                if (
+                    not compressible
+                    or "content-encoding" in headers
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding)
+                headers["content-encoding"] = encoding
+                if "etag" in headers:
+                    headers["etag"] = _weak(headers["etag"])
+                if not more_body:
+                    body = compressor.finish(body)
+                    headers["content-length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                del headers["content-length"]
+                await send(start_message)
+
+            data = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
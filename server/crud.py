@@ -1,48 +1,264 @@
-from sqlalchemy.orm import Session, joinedload, aliased
+from sqlalchemy.orm import Session, joinedload, selectinload, defer, load_only
+from sqlalchemy import and_, delete, event, false, func, insert, literal, or_, select, text, true, union_all, update
+from sqlalchemy.exc import IntegrityError
 from typing import Optional
-from sqlalchemy import or_
-from models import Post, Category, TagType, TagOption
-from schemas import PostCreate, PostUpdate, CategoryCreate, CategoryUpdate, CategoryResponse, TagCreate, TagUpdate
-from typing import List
+from models import Post, Category, CategoryClosure, TagType, TagOption, ResourceVersion, ChangeEvent, post_tag_options
+from schemas import PostCreate, PostUpdate, PostDetail, PostListItem, PostPage, Facets, CategoryCreate, CategoryUpdate, CategoryResponse, TagCreate, TagUpdate, TagOptionUpdate, TagBatchUpdate
+from schemas import CategoryImport, TagImport, TagOptionImport, PostImport, ChangeFeed
+from typing import List, NamedTuple, Tuple
+from datetime import datetime, timezone
 from fastapi import HTTPException
+from lexical import extract_text, make_excerpt, render_html, content_hash
+from collections import defaultdict
+import json
+import cache
+import outbox
+import search as search_index
+
+POSTS_PAGE_SIZE = 20
+
+#! --------------------------- VERSÕES ---------------------------
+class VersionStamp(NamedTuple):
+    version: str
+    updated_at: Optional[datetime]
+
+def invalidate_after_commit(db: Session, *tags: str):
+    # Tags do cache invalidadas quando (e se) a transação for confirmada
+    db.info.setdefault("cache_tags", set()).update(tags)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_cache_tags(session: Session):
+    cache.invalidate_tags(*session.info.pop("cache_tags", ()))
+
+@event.listens_for(Session, "after_commit")
+def _notify_changes(session: Session):
+    if session.info.pop("changes", False):
+        outbox.notify()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_cache_tags(session: Session):
+    session.info.pop("cache_tags", None)
+    session.info.pop("changes", None)
+
+def touch_versions(db: Session, *names: str):
+    # Incrementa a versão dos recursos alterados, na mesma transação da escrita,
+    # e invalida no cache tudo que depende deles depois do commit
+    invalidate_after_commit(db, *names)
+    now = datetime.now(timezone.utc)
+    for name in names:
+        updated = db.query(ResourceVersion).filter(ResourceVersion.name == name).update({
+            ResourceVersion.version: ResourceVersion.version + 1,
+            ResourceVersion.updated_at: now
+        })
+        if not updated:
+            db.add(ResourceVersion(name=name, version=1, updated_at=now))
+
+def get_versions(db: Session, *names: str) -> VersionStamp:
+    rows = {row.name: row for row in db.query(ResourceVersion).filter(ResourceVersion.name.in_(names)).all()}
+    return VersionStamp(
+        version=".".join(str(rows[name].version if name in rows else 0) for name in names),
+        updated_at=max((row.updated_at for row in rows.values()), default=None)
+    )
+
+#! -------------------------- ALTERAÇÕES --------------------------
+def record_change(db: Session, resource: str, action: str, *resource_ids: int):
+    """
+    Grava no outbox os eventos de uma escrita, na mesma transação dela: o evento só existe
+    se a escrita for confirmada. A linha "changes" de resource_versions fica travada até o
+    commit, então os ids saem na ordem dos commits e quem leu até o id N não perde um
+    evento menor que apareceu depois.
+    O preço: escritas concorrentes ficam em fila nessa linha do touch_versions até o commit
+    (uma sequence sozinha não garante a ordem dos commits). Por isso record_change é a última
+    coisa antes do commit em cada escrita, e o trecho travado é curto.
+    """
+    if not resource_ids:
+        return
+    touch_versions(db, "changes")
+    now = datetime.now(timezone.utc)
+    db.execute(insert(ChangeEvent), [
+        {"resource": resource, "resource_id": resource_id, "action": action, "created_at": now}
+        for resource_id in resource_ids
+    ])
+    db.info["changes"] = True
+
+def get_change_feed(db: Session, since: Optional[int], limit: int) -> ChangeFeed:
+    # Limites do que está guardado. O evento mais novo nunca é apagado (prune_changes) e os ids
+    # não se repetem (AUTOINCREMENT/sequence), então o maior id é a marca d'água do feed
+    oldest, newest = db.execute(select(
+        select(func.min(ChangeEvent.id)).scalar_subquery(),
+        select(func.max(ChangeEvent.id)).scalar_subquery()
+    )).one()
+    newest = newest or 0
+    # Sem cursor, só a posição atual: o cliente passa a receber o que vier depois dela
+    if since is None:
+        return ChangeFeed(last_id=newest)
+
+    # Cursor que o feed não tem como continuar: anterior ao evento mais antigo guardado (o meio
+    # saiu pela retenção) ou além do mais novo (banco restaurado/trocado). O cliente recarrega tudo.
+    if since > newest or (oldest is not None and since < oldest - 1):
+        return ChangeFeed(last_id=newest, reset=True)
+
+    events = db.query(ChangeEvent).filter(ChangeEvent.id > since).order_by(ChangeEvent.id).limit(limit).all()
+    return ChangeFeed(events=events, last_id=events[-1].id if events else since)
+
+def prune_changes(db: Session, before: datetime) -> int:
+    # O evento mais novo fica sempre, mesmo velho: ele guarda a marca d'água do feed
+    newest = select(func.max(ChangeEvent.id)).scalar_subquery()
+    deleted = db.query(ChangeEvent)\
+                .filter(ChangeEvent.created_at < before, ChangeEvent.id < newest)\
+                .delete(synchronize_session=False)
+    db.commit()
+    return deleted
 
 #! -------------------------- CATEGORIA --------------------------
+def _build_categories_tree(db: Session) -> List[CategoryResponse]:
+    # Uma única consulta com todas as categorias; a árvore é montada em memória
+    categories = db.query(Category.id, Category.name, Category.parent_id, Category.image_url,
+                          Category.image_srcset, Category.image_webp_srcset)\
+                   .order_by(Category.id)\
+                   .all()
+
+    children = defaultdict(list)
+    for cat in categories:
+        children[cat.parent_id].append(cat)
+
+    def serialize_category(cat) -> CategoryResponse:
+        return CategoryResponse(
+            id=cat.id,
+            name=cat.name,
+            parent_id=cat.parent_id,
+            image_url=cat.image_url,
+            image_srcset=cat.image_srcset,
+            image_webp_srcset=cat.image_webp_srcset,
+            subcategories=[serialize_category(sub) for sub in children[cat.id]]
+        )
+
+    return [serialize_category(cat) for cat in children[None]]
 
 def get_categories_tree(db: Session):
-    root_categories = db.query(Category).filter(Category.parent_id == None).options(joinedload(Category.children)).all()
+    return _build_categories_tree(db)
+
+def _link_category(db: Session, category_id: int, parent_id: Optional[int]):
+    # Nova categoria na closure table: herda os ancestrais do pai (+1 de profundidade) e aponta para si mesma
+    ancestors = select(CategoryClosure.ancestor_id, literal(category_id), CategoryClosure.depth + 1)\
+        .where(CategoryClosure.descendant_id == parent_id)
+    itself = select(literal(category_id), literal(category_id), literal(0))
+    db.execute(
+        insert(CategoryClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            union_all(ancestors, itself) if parent_id else itself
+        )
+    )
 
-    def serialize_category(cat: Category) -> CategoryResponse:
-        return CategoryResponse(
-            id=getattr(cat, "id"),
-            name=getattr(cat, "name"),
-            parent_id=getattr(cat, "parent_id"),
-            image_url=getattr(cat, "image_url"),
-            subcategories=[serialize_category(sub) for sub in cat.children]
+def _link_categories(db: Session, category_ids: List[int]):
+    # Mesmo que _link_category para várias categorias de uma vez (um INSERT ... SELECT só),
+    # com o pai de cada uma lido da própria linha. Os pais precisam já estar na closure table.
+    if not category_ids:
+        return
+    ancestors = select(CategoryClosure.ancestor_id, Category.id, CategoryClosure.depth + 1)\
+        .join(CategoryClosure, CategoryClosure.descendant_id == Category.parent_id)\
+        .where(Category.id.in_(category_ids))
+    itself = select(Category.id, Category.id, literal(0)).where(Category.id.in_(category_ids))
+    db.execute(
+        insert(CategoryClosure).from_select(["ancestor_id", "descendant_id", "depth"], union_all(ancestors, itself))
+    )
+
+def _move_category(db: Session, category_id: int, parent_id: Optional[int]):
+    # Move a subárvore inteira: desfaz os vínculos com os ancestrais antigos e liga aos novos
+    subtree = select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+    if parent_id is not None and db.query(subtree.where(CategoryClosure.descendant_id == parent_id).exists()).scalar():
+        raise HTTPException(status_code=400, detail="Uma categoria não pode ficar dentro de si mesma.")
+
+    db.execute(
+        delete(CategoryClosure)
+        .where(CategoryClosure.descendant_id.in_(subtree.scalar_subquery()))
+        .where(CategoryClosure.ancestor_id.not_in(subtree.scalar_subquery()))
+        .execution_options(synchronize_session=False)
+    )
+    if parent_id is None:
+        return
+
+    above = select(CategoryClosure).where(CategoryClosure.descendant_id == parent_id).subquery()
+    below = select(CategoryClosure).where(CategoryClosure.ancestor_id == category_id).subquery()
+    db.execute(
+        insert(CategoryClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+            .select_from(above.join(below, true()))
         )
+    )
+
+def subtree_ids(category_ids: List[int]):
+    # Ids de todas as categorias abaixo das informadas (incluindo elas): um lookup indexado na closure table
+    return select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id.in_(category_ids))
 
-    return [serialize_category(cat) for cat in root_categories]
+def get_category_breadcrumbs(db: Session, category_id: int) -> List[Category]:
+    # Caminho da raiz até a categoria, em uma query
+    return db.query(Category)\
+             .join(CategoryClosure, CategoryClosure.ancestor_id == Category.id)\
+             .filter(CategoryClosure.descendant_id == category_id)\
+             .order_by(CategoryClosure.depth.desc())\
+             .all()
 
 def create_category(db: Session, category_data: CategoryCreate, image_url: str):
+    if category_data.parent_id and not db.get(Category, category_data.parent_id):
+        raise HTTPException(status_code=404, detail="Categoria pai não encontrada.")
+
     category = Category(
         name=category_data.name, 
         parent_id=category_data.parent_id,
         image_url=image_url
         )
     db.add(category)
+    db.flush()
+    _link_category(db, category.id, category.parent_id)
+    touch_versions(db, "categories")
+    record_change(db, "categories", "created", category.id)
     db.commit()
     db.refresh(category)
     return category
 
+def set_category_image(db: Session, category_id: int, image_url: str):
+    # Imagem nova: as variantes da antiga deixam de valer até o processamento da nova terminar
+    category = db.get(Category, category_id)
+    if not category:
+        return None
+    category.image_url = image_url
+    category.image_srcset = None
+    category.image_webp_srcset = None
+    touch_versions(db, "categories")
+    record_change(db, "categories", "updated", category_id)
+    db.commit()
+    db.refresh(category)
+    return category
+
+def set_category_image_variants(db: Session, category_id: int, image_url: str, variants: dict):
+    # Só grava se a categoria ainda usa a mesma imagem (outro upload pode ter chegado no meio)
+    updated = db.query(Category)\
+                .filter(Category.id == category_id, Category.image_url == image_url)\
+                .update(variants, synchronize_session=False)
+    if updated:
+        touch_versions(db, "categories")
+        record_change(db, "categories", "updated", category_id)
+    db.commit()
+
 
 def update_category(db: Session, category_id: int, category_data: CategoryUpdate):
     category = db.query(Category).filter(Category.id == category_id).first()
     if not category:
         return None
 
-    db.query(Category).filter(Category.id == category_id).update({
-        Category.name: category_data.name
-    })
-    
+    values = {Category.name: category_data.name}
+    # Só muda de lugar na árvore quando o parent_id vem no corpo da requisição
+    if "parent_id" in category_data.model_fields_set and category_data.parent_id != category.parent_id:
+        if category_data.parent_id and not db.get(Category, category_data.parent_id):
+            raise HTTPException(status_code=404, detail="Categoria pai não encontrada.")
+        _move_category(db, category_id, category_data.parent_id)
+        values[Category.parent_id] = category_data.parent_id
+
+    db.query(Category).filter(Category.id == category_id).update(values)
+    touch_versions(db, "categories")
+    record_change(db, "categories", "updated", category_id)
     db.commit()
     return db.query(Category).filter(Category.id == category_id).first()
 
@@ -56,13 +272,34 @@ def delete_category(db: Session, category_id: int):
     if has_posts:
         return "Categoria possui posts e não pode ser excluída."
 
+    has_subcategories = db.query(Category.id).filter(Category.parent_id == category_id).first()
+    if has_subcategories:
+        return "Categoria possui subcategorias e não pode ser excluída."
+
+    db.execute(delete(CategoryClosure).where(CategoryClosure.descendant_id == category_id))
     db.delete(category)
+    touch_versions(db, "categories")
+    record_change(db, "categories", "deleted", category_id)
     db.commit()
     return category
 
 #! ---------------------------- TAGS ----------------------------
 def get_tags(db: Session):
-    return db.query(TagType).all()
+    return db.query(TagType).options(selectinload(TagType.options)).all()
+
+def _load_tag(db: Session, tag_id: int):
+    # Recarrega a tag já com as opções, para a resposta não depender de lazy load
+    return db.query(TagType).filter(TagType.id == tag_id)\
+             .options(selectinload(TagType.options))\
+             .execution_options(populate_existing=True)\
+             .first()
+
+def _delete_tag_options(db: Session, option_ids):
+    # Tira as opções dos posts antes de apagar, para não deixar associações órfãs
+    if not option_ids:
+        return
+    db.execute(delete(post_tag_options).where(post_tag_options.c.tag_option_id.in_(option_ids)))
+    db.execute(delete(TagOption).where(TagOption.id.in_(option_ids)).execution_options(synchronize_session=False))
 
 def create_tag(db: Session, tag_data: TagCreate):
     existing = db.query(TagType).filter(TagType.name == tag_data.name).first()
@@ -70,130 +307,648 @@ def create_tag(db: Session, tag_data: TagCreate):
         raise HTTPException(status_code=400, detail="Uma tag com esse nome já existe.")
     
     new_tag = TagType(name=tag_data.name, is_mandatory=tag_data.is_mandatory)
+    new_tag.options = [TagOption(name=option_name) for option_name in dict.fromkeys(tag_data.options)]
     db.add(new_tag)
+    db.flush()
+    touch_versions(db, "tags")
+    record_change(db, "tags", "created", new_tag.id)
     db.commit()
-    db.refresh(new_tag)
-
-    for option_name in tag_data.options:
-        new_option = TagOption(name=option_name, tag_type_id=new_tag.id)
-        db.add(new_option)
+    return _load_tag(db, new_tag.id)
+
+def _tag_option_items(tag: TagUpdate) -> List[TagOptionUpdate]:
+    """
+    Normaliza as opções enviadas. Repetições da mesma opção viram uma só (inclusive a mesma
+    opção por id e por nome); o mesmo id com nomes diferentes ou o mesmo nome em ids
+    diferentes é ambíguo e volta 422 com os itens em conflito.
+    """
+    items = [item if isinstance(item, TagOptionUpdate) else TagOptionUpdate(name=item) for item in tag.options]
+    names_by_id, ids_by_name, conflicts = {}, {}, []
+    for item in items:
+        if item.id is None:
+            continue
+        if names_by_id.get(item.id, item.name) != item.name:
+            conflicts.append(f"opção {item.id} ('{names_by_id[item.id]}' e '{item.name}')")
+        elif ids_by_name.get(item.name, item.id) != item.id:
+            conflicts.append(f"'{item.name}' (opções {ids_by_name[item.name]} e {item.id})")
+        names_by_id.setdefault(item.id, item.name)
+        ids_by_name.setdefault(item.name, item.id)
+    if conflicts:
+        raise HTTPException(status_code=422, detail=f"Opções repetidas na tag {tag.name}: {', '.join(conflicts)}.")
+
+    new_names = dict.fromkeys(item.name for item in items if item.id is None and item.name not in ids_by_name)
+    return [TagOptionUpdate(id=option_id, name=name) for option_id, name in names_by_id.items()] + \
+           [TagOptionUpdate(name=name) for name in new_names]
+
+def _apply_tag_update(db: Session, tag_type: TagType, tag: TagUpdate):
+    # Compara as opções enviadas com as atuais: mantém as iguais (mesmo id),
+    # renomeia as que vieram com id, insere as novas e apaga só as removidas.
+    items = _tag_option_items(tag)
+    tag_type.name = str(tag.name)
+    tag_type.is_mandatory = bool(tag.is_mandatory)
 
-    db.commit()
-    db.refresh(new_tag)
-    return new_tag
+    current = {option.id: option for option in tag_type.options}
+    by_name = {option.name: option for option in tag_type.options}
+    kept, new_names = set(), []
+
+    # As com id vêm antes: uma opção renomeada não é reaproveitada pelo nome antigo
+    for item in items:
+        if item.id is not None:
+            option = current.get(item.id)
+            if option is None:
+                raise HTTPException(status_code=400, detail=f"Opção {item.id} não pertence à tag {tag_type.name}.")
+            option.name = item.name
+            kept.add(option.id)
+        elif item.name in by_name and by_name[item.name].id not in kept:
+            kept.add(by_name[item.name].id)
+        else:
+            new_names.append(item.name)
+
+    _delete_tag_options(db, [option_id for option_id in current if option_id not in kept])
+    if new_names:
+        db.execute(insert(TagOption), [{"name": name, "tag_type_id": tag_type.id} for name in new_names])
 
 def update_tag(db: Session, tag_id: int, tag: TagUpdate):
-    tag_type = db.query(TagType).filter(TagType.id == tag_id).first()
+    tag_type = db.query(TagType).filter(TagType.id == tag_id).options(selectinload(TagType.options)).first()
     if not tag_type:
         raise HTTPException(status_code=404, detail="Tag não encontrada") 
 
-    tag_type.name = str(tag.name)
-    tag_type.is_mandatory = bool(tag.is_mandatory)
+    _apply_tag_update(db, tag_type, tag)
+    touch_versions(db, "tags")
+    record_change(db, "tags", "updated", tag_id)
     db.commit()
-
-    db.query(TagOption).filter(TagOption.tag_type_id == tag_id).delete()
+    return _load_tag(db, tag_id)
+
+def update_tags(db: Session, tags: List[TagBatchUpdate]):
+    # Edição em lote: todas as tags em uma transação (ou nenhuma, se alguma falhar)
+    tag_types = {
+        tag_type.id: tag_type for tag_type in
+        db.query(TagType).filter(TagType.id.in_([tag.id for tag in tags])).options(selectinload(TagType.options)).all()
+    }
+    missing = [tag.id for tag in tags if tag.id not in tag_types]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Tags não encontradas: {missing}")
+
+    for tag in tags:
+        _apply_tag_update(db, tag_types[tag.id], tag)
+    touch_versions(db, "tags")
+    record_change(db, "tags", "updated", *tag_types)
     db.commit()
 
-    for option_name in tag.options:
-        new_option = TagOption(name=option_name, tag_type_id=tag_id)
-        db.add(new_option)
-
-    db.commit()
-    db.refresh(tag_type)
-    return tag_type
+    return db.query(TagType).filter(TagType.id.in_(tag_types))\
+             .options(selectinload(TagType.options))\
+             .execution_options(populate_existing=True)\
+             .order_by(TagType.id)\
+             .all()
 
 def delete_tag(db: Session, tag_id: int):
     tag_type = db.query(TagType).filter(TagType.id == tag_id).first()
     if not tag_type:
         raise HTTPException(status_code=404, detail="Tag não encontrada") 
     
-    db.query(TagOption).filter(TagOption.tag_type_id == tag_id).delete()
-    db.commit()
-
+    _delete_tag_options(db, [option_id for (option_id,) in db.query(TagOption.id).filter(TagOption.tag_type_id == tag_id).all()])
     db.delete(tag_type)
+    touch_versions(db, "tags")
+    record_change(db, "tags", "deleted", tag_id)
     db.commit()
     return {"message": "Tag excluída com sucesso"}
 
 #! ---------------------------- POST ----------------------------
-def get_posts_by_categories(db: Session, category_ids: List[int]):
-    if not category_ids:
-        return []
+def _paginate_posts(query, limit: int, after: Optional[int]) -> PostPage:
+    # Paginação por cursor (keyset) em Post.id, do mais novo para o mais antigo.
+    if after is not None:
+        query = query.filter(Post.id < after)
+
+    rows = query.order_by(Post.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return PostPage(
+        items=[PostListItem.model_validate(row) for row in rows],
+        next_cursor=rows[-1].id if has_more else None
+    )
 
-    # Busca os posts associados às categorias
-    posts = db.query(Post).filter(Post.category_id.in_(category_ids)).all()
-    return posts
-
-def get_posts(db: Session, search: Optional[str] = None):
-    # Alias para a categoria
-    category_alias = aliased(Category)
-
-    # Join entre post e categoria (alias)
-    query = db.query(Post).join(category_alias, Post.category_id == category_alias.id)
-
-    if search:
-        query = query.filter(
-            or_(
-                Post.title.ilike(f"%{search}%"),  # Filtro por título
-                Post.content.ilike(f"%{search}%"),  # Filtro por conteúdo
-                category_alias.name.ilike(f"%{search}%")  # Filtro por nome da categoria (usando o alias)
-            )
-        )
+def _paginate_ranked(query, rank, limit: int, after: Optional[int]) -> PostPage:
+    # Keyset em (relevância, id): o cursor continua sendo o id do último post da página,
+    # e a relevância dele é calculada de novo no banco (comparar com o float lido seria impreciso).
+    # Se o post do cursor deixou de casar com a busca, a relevância é NULL e a listagem termina.
+    if after is not None:
+        after_rank = query.filter(Post.id == after).with_entities(rank).correlate(None).scalar_subquery()
+        query = query.filter(or_(rank > after_rank, and_(rank == after_rank, Post.id < after)))
+
+    rows = query.order_by(rank, Post.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return PostPage(
+        items=[PostListItem.model_validate(row) for row in rows],
+        next_cursor=rows[-1].id if has_more else None
+    )
 
-    return query.all()
+def _post_list_query(db: Session):
+    # Só as colunas da listagem são carregadas (o content nunca sai do banco).
+    # Categoria e opções de tag vêm em uma query cada para a página inteira,
+    # então a listagem custa sempre o mesmo número de queries, seja qual for o tamanho.
+    return db.query(Post).options(
+        load_only(Post.id, Post.title, Post.category_id, Post.excerpt),
+        selectinload(Post.category).load_only(Category.id, Category.name, Category.parent_id, Category.image_url,
+                                              Category.image_srcset, Category.image_webp_srcset),
+        selectinload(Post.tag_options)
+    )
 
-def get_post_by_id(db: Session, post_id: int):
-    return db.query(Post)\
-             .filter(Post.id == post_id)\
-             .options(joinedload(Post.tag_options))\
-             .first()
+def _tagged_post_ids(tag_option_ids: List[int], tag_mode: str = "any"):
+    # Posts com as opções de tag, direto do índice reverso de post_tag_options.
+    # "any": pelo menos uma das opções; "all": todas (GROUP BY/HAVING no lugar de filtrar em Python).
+    tag_option_ids = list(set(tag_option_ids))
+    tagged = select(post_tag_options.c.post_id).where(post_tag_options.c.tag_option_id.in_(tag_option_ids))
+    if tag_mode == "all" and len(tag_option_ids) > 1:
+        tagged = tagged.group_by(post_tag_options.c.post_id).having(func.count() == len(tag_option_ids))
+    return tagged
+
+def _filter_posts(query, category_ids: Optional[List[int]] = None, include_descendants: bool = False,
+                  tag_option_ids: Optional[List[int]] = None, tag_mode: str = "any"):
+    if category_ids:
+        # Posts das categorias (e, se pedido, das subcategorias delas em qualquer nível)
+        categories = subtree_ids(category_ids) if include_descendants else category_ids
+        query = query.filter(Post.category_id.in_(categories))
+    if tag_option_ids:
+        query = query.filter(Post.id.in_(_tagged_post_ids(tag_option_ids, tag_mode)))
+    return query
+
+def get_posts_by_categories(db: Session, category_ids: List[int], limit: int = POSTS_PAGE_SIZE,
+                            after: Optional[int] = None, include_descendants: bool = False):
+    if not category_ids:
+        return PostPage()
 
-def create_post(db: Session, post_data: PostCreate):
-    if post_data.category_id:
-        category_exists = db.query(Category).filter(Category.id == post_data.category_id).first()
-        if not category_exists:
-            return "Categoria não encontrada."
-    
-    new_post = Post(
-        title=post_data.title, 
+    # Busca os posts associados às categorias
+    query = _filter_posts(_post_list_query(db), category_ids, include_descendants)
+    return _paginate_posts(query, limit, after)
+
+def get_posts(db: Session, search: Optional[str] = None, limit: int = POSTS_PAGE_SIZE, after: Optional[int] = None,
+              category_ids: Optional[List[int]] = None, include_descendants: bool = False,
+              tag_option_ids: Optional[List[int]] = None, tag_mode: str = "any"):
+    # Filtros de categoria, tag e busca podem ser combinados
+    query = _filter_posts(_post_list_query(db), category_ids, include_descendants, tag_option_ids, tag_mode)
+
+    if search and search.strip():
+        query, rank = search_index.search_posts(db, query, search.strip())
+        if rank is not None:
+            return _paginate_ranked(query, rank, limit, after)
+
+    return _paginate_posts(query, limit, after)
+
+# Coluna que guarda cada formato do conteúdo do post
+POST_CONTENT_COLUMNS = {
+    "lexical": Post.content,
+    "html": Post.content_html,
+    "text": Post.plain_text,
+}
+
+def _post_detail(post: Post, content_format: str) -> PostDetail:
+    content = getattr(post, POST_CONTENT_COLUMNS[content_format].key)
+    if content_format == "lexical" and not isinstance(content, str):
+        # Driver que decodifica a coluna JSON do Postgres (o psycopg2 é configurado para não decodificar)
+        content = json.dumps(content)
+    elif content is None:
+        # Post antigo ainda sem o formato pré-renderizado
+        content = render_html(post.content) if content_format == "html" else extract_text(post.content)
+
+    return PostDetail(
+        id=post.id,
+        title=post.title,
+        category_id=post.category_id,
+        excerpt=post.excerpt,
+        format=content_format,
+        content=content,
+        category=post.category,
+        tag_options=post.tag_options,
+        version=post.version
+    )
+
+def _post_detail_query(db: Session, content_format: str):
+    # Carrega só a coluna do formato pedido; os outros formatos nem saem do banco
+    deferred = [defer(column) for name, column in POST_CONTENT_COLUMNS.items() if name != content_format]
+    # As opções vêm numa segunda query pela chave: no JOIN aninhado do joinedload
+    # (post_tag_options JOIN tag_options) o SQLite varre a tabela de associação inteira
+    return db.query(Post).options(joinedload(Post.category), selectinload(Post.tag_options), *deferred)
+
+def get_post_by_id(db: Session, post_id: int, content_format: str = "lexical") -> Optional[PostDetail]:
+    post = _post_detail_query(db, content_format).filter(Post.id == post_id).first()
+    return _post_detail(post, content_format) if post else None
+
+def get_post_details(db: Session, post_ids: List[int], content_format: str = "lexical") -> List[PostDetail]:
+    # Vários posts completos com o mesmo custo de um (duas queries), na ordem dos ids
+    posts = _post_detail_query(db, content_format).filter(Post.id.in_(post_ids)).order_by(Post.id).all()
+    return [_post_detail(post, content_format) for post in posts]
+
+def _load_post_references(db: Session, category_id: Optional[int], tag_option_ids: List[int],
+                          post_id: Optional[int] = None, digest: Optional[str] = None):
+    """
+    Valida a categoria e as opções de tag de uma escrita numa única consulta e devolve
+    (categoria, opções, conteúdo gravado). Os objetos também montam a resposta, sem reler o
+    post depois. Com post_id e digest, a mesma consulta traz o texto e o resumo já gravados
+    se o conteúdo do post tem esse hash (senão o terceiro item é None: precisa renderizar).
+    """
+    option_ids = set(tag_option_ids)
+    if not category_id and not option_ids and post_id is None:
+        return None, [], None
+
+    # Uma linha âncora com a categoria, o post e cada opção ao lado (LEFT JOIN: o que não existe vem NULL)
+    anchor = select(literal(1).label("anchor")).subquery()
+    unchanged = and_(Post.id == post_id, Post.content_hash == digest, Post.content_html.isnot(None)) \
+        if post_id is not None and digest else false()
+    rows = db.execute(
+        select(Category, TagOption, Post.plain_text, Post.excerpt)
+        .select_from(anchor)
+        .outerjoin(Category, Category.id == category_id if category_id else false())
+        .outerjoin(Post, unchanged)
+        .outerjoin(TagOption, TagOption.id.in_(option_ids) if option_ids else false())
+        .order_by(TagOption.id)
+    ).all()
+
+    category = rows[0][0] if rows else None
+    if category_id and category is None:
+        raise HTTPException(status_code=404, detail="Categoria não encontrada.")
+    tag_options = [row[1] for row in rows if row[1] is not None]
+    if len(tag_options) != len(option_ids):
+        raise HTTPException(status_code=400, detail="Uma ou mais tags não foram encontradas.")
+    stored = {"plain_text": rows[0].plain_text, "excerpt": rows[0].excerpt} \
+        if rows and rows[0].plain_text is not None else None
+    return category, tag_options, stored
+
+def _content_values(content: str, digest: Optional[str] = None) -> dict:
+    # Colunas derivadas do JSON do Lexical (busca, listagem e HTML pré-renderizado)
+    plain_text = extract_text(content)
+    return {
+        "content": content,
+        "plain_text": plain_text,
+        "excerpt": make_excerpt(plain_text),
+        "content_html": render_html(content),
+        "content_hash": digest or content_hash(content),
+    }
+
+def _replace_post_tags(db: Session, post_id: int, option_ids: set):
+    # Diferença de conjuntos no próprio banco: só as associações que mudaram são apagadas ou inseridas
+    db.execute(delete(post_tag_options).where(
+        post_tag_options.c.post_id == post_id,
+        post_tag_options.c.tag_option_id.not_in(option_ids)
+    ))
+    if option_ids:
+        current = select(post_tag_options.c.tag_option_id).where(post_tag_options.c.post_id == post_id)
+        db.execute(insert(post_tag_options).from_select(
+            ["post_id", "tag_option_id"],
+            select(literal(post_id), TagOption.id).where(TagOption.id.in_(option_ids), TagOption.id.not_in(current))
+        ))
+
+def _written_post(post_id: int, post_data, values: dict, category, tag_options, version: int) -> PostDetail:
+    # Resposta da escrita montada com o que já está em memória (antes do commit expirar os objetos)
+    return PostDetail(
+        id=post_id,
+        title=post_data.title,
+        category_id=post_data.category_id,
+        excerpt=values["excerpt"],
         content=post_data.content,
-        category_id=post_data.category_id
+        category=category,
+        tag_options=tag_options,
+        version=version
     )
 
-    if post_data.tag_option_ids:
-        tag_options = db.query(TagOption).filter(TagOption.id.in_(post_data.tag_option_ids)).all()
-        if len(tag_options) != len(post_data.tag_option_ids):
-            raise HTTPException(status_code=400, detail="Uma ou mais tags não foram encontradas.")
-        new_post.tag_options = tag_options
-        
-    db.add(new_post)
+def create_post(db: Session, post_data: PostCreate):
+    category, tag_options, _ = _load_post_references(db, post_data.category_id, post_data.tag_option_ids)
+    values = _content_values(post_data.content)
+
+    # Um INSERT só: o id volta pelo RETURNING no Postgres e pelo lastrowid no SQLite
+    post_id = db.execute(
+        insert(Post).values(title=post_data.title, category_id=post_data.category_id, **values)
+    ).inserted_primary_key[0]
+    if tag_options:
+        db.execute(insert(post_tag_options), [{"post_id": post_id, "tag_option_id": option.id} for option in tag_options])
+
+    search_index.index_post(db, post_id, post_data.title, values["plain_text"])
+    touch_versions(db, "posts")
+    record_change(db, "posts", "created", post_id)
+    post = _written_post(post_id, post_data, values, category, tag_options, version=1)
     db.commit()
-    db.refresh(new_post)
-    return new_post
+    return post
 
 def update_post(db: Session, post_id: int, post_data: PostUpdate):
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
-        return None
-
-    db.query(Post).filter(Post.id == post_id).update({
-        Post.title: post_data.title,
-        Post.content: post_data.content,
-        Post.category_id: post_data.category_id  
-    })
-
-    if post_data.tag_option_ids is not None:
-        tag_options = db.query(TagOption).filter(TagOption.id.in_(post_data.tag_option_ids)).all()
-        if len(tag_options) != len(post_data.tag_option_ids):
-            raise HTTPException(status_code=400, detail="Uma ou mais tags não foram encontradas.")
-        post.tag_options = tag_options
-    
+    """
+    Atualiza o post num único UPDATE ... RETURNING, já incrementando a versão.
+    Com post_data.version, o UPDATE só acontece se o post ainda estiver nessa versão:
+    outra edição no meio do caminho faz esta falhar com 409 em vez de sobrescrevê-la.
+    Conteúdo igual ao gravado (mesmo content_hash) não é renderizado nem regravado.
+    Custo: 7 statements no Postgres (referências + hash, UPDATE, DELETE e INSERT das tags,
+    versões de "posts" e "changes", evento do outbox); 9 no SQLite, com o índice FTS5.
+    """
+    digest = content_hash(post_data.content)
+    category, tag_options, stored = _load_post_references(
+        db, post_data.category_id, post_data.tag_option_ids, post_id, digest
+    )
+    values = stored or _content_values(post_data.content, digest)
+
+    statement = update(Post)\
+        .where(Post.id == post_id)\
+        .values(title=post_data.title, category_id=post_data.category_id, version=Post.version + 1,
+                **({} if stored else values))\
+        .execution_options(synchronize_session=False)
+    if post_data.version is not None:
+        statement = statement.where(Post.version == post_data.version)
+    if stored:
+        # O conteúdo não pode ter mudado entre a leitura do hash e o UPDATE
+        statement = statement.where(Post.content_hash == digest)
+
+    if db.get_bind().dialect.update_returning:
+        version = db.execute(statement.returning(Post.version)).scalar_one_or_none()
+    else:
+        updated = db.execute(statement).rowcount
+        version = db.query(Post.version).filter(Post.id == post_id).scalar() if updated else None
+
+    if version is None:
+        # Só no caminho de erro: o post não existe (404) ou mudou de versão (409)
+        db.rollback()
+        if db.query(Post.id).filter(Post.id == post_id).first() is None:
+            return None
+        raise HTTPException(status_code=409, detail="O post foi alterado em outra edição. Recarregue antes de salvar.")
+
+    _replace_post_tags(db, post_id, {option.id for option in tag_options})
+    search_index.index_post(db, post_id, post_data.title, values["plain_text"])
+    touch_versions(db, "posts")
+    record_change(db, "posts", "updated", post_id)
+    invalidate_after_commit(db, f"post:{post_id}")
+    post = _written_post(post_id, post_data, values, category, tag_options, version)
     db.commit()
-    return db.query(Post).filter(Post.id == post_id).first()
+    return post
 
 def delete_post(db: Session, post_id: int):
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
+    db.execute(delete(post_tag_options).where(post_tag_options.c.post_id == post_id))
+    deleted = db.execute(delete(Post).where(Post.id == post_id).execution_options(synchronize_session=False)).rowcount
+    if not deleted:
+        db.rollback()
         return None
-    db.delete(post)
+    search_index.remove_post(db, post_id)
+    touch_versions(db, "posts")
+    record_change(db, "posts", "deleted", post_id)
+    invalidate_after_commit(db, f"post:{post_id}")
     db.commit()
-    return post
\ No newline at end of file
+    return True
+
+#! ---------------------------- FACETS ----------------------------
+def _build_facets(db: Session, rollup: bool) -> Facets:
+    # Agregados com GROUP BY (uma consulta por faceta), nunca post a post
+    direct = dict(
+        db.query(Post.category_id, func.count(Post.id))
+          .filter(Post.category_id.isnot(None))
+          .group_by(Post.category_id)
+          .all()
+    )
+    subtree = {}
+    if rollup:
+        subtree = dict(
+            db.query(CategoryClosure.ancestor_id, func.count(Post.id))
+              .join(Post, Post.category_id == CategoryClosure.descendant_id)
+              .group_by(CategoryClosure.ancestor_id)
+              .all()
+        )
+
+    categories = db.query(Category.id, Category.name, Category.parent_id).order_by(Category.id).all()
+    tag_options = db.query(TagOption.id, TagOption.name, TagOption.tag_type_id, func.count(post_tag_options.c.post_id))\
+                    .outerjoin(post_tag_options, post_tag_options.c.tag_option_id == TagOption.id)\
+                    .group_by(TagOption.id, TagOption.name, TagOption.tag_type_id)\
+                    .order_by(TagOption.id)\
+                    .all()
+
+    return Facets(
+        categories=[
+            {
+                "id": cat.id,
+                "name": cat.name,
+                "parent_id": cat.parent_id,
+                "count": direct.get(cat.id, 0),
+                "subtree_count": subtree.get(cat.id, 0) if rollup else None
+            }
+            for cat in categories
+        ],
+        tag_options=[
+            {"id": option_id, "name": name, "tag_type_id": tag_type_id, "count": count}
+            for option_id, name, tag_type_id, count in tag_options
+        ]
+    )
+
+def get_facets(db: Session, rollup: bool = False) -> Facets:
+    return _build_facets(db, rollup)
+
+#! ---------------------------- BULK ----------------------------
+# Linhas por transação na importação/exportação em massa
+BULK_CHUNK_SIZE = 500
+
+def _bulk_insert(db: Session, model, rows: List[dict]) -> List[int]:
+    # executemany com RETURNING: um round-trip por lote e os ids voltam na ordem das linhas.
+    # Linhas com id explícito e sem id vão em lotes separados (as chaves têm que ser iguais).
+    ids: List[Optional[int]] = [None] * len(rows)
+    for with_id in (True, False):
+        positions = [i for i, row in enumerate(rows) if (row.get("id") is not None) == with_id]
+        if not positions:
+            continue
+        if not with_id and any(id_ is not None for id_ in ids):
+            # Sem isso o nextval() do Postgres devolveria os ids que acabaram de ser inseridos
+            _sync_sequences(db, model.__tablename__)
+        batch = [rows[i] if with_id else {k: v for k, v in rows[i].items() if k != "id"} for i in positions]
+        new_ids = db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), batch).scalars().all()
+        for i, new_id in zip(positions, new_ids):
+            ids[i] = new_id
+    return ids
+
+def _sync_sequences(db: Session, *tables: str):
+    # Depois de inserir ids explícitos no Postgres, a sequence precisa andar junto
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for table in tables:
+        db.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+def _import_categories(db: Session, rows: List[Tuple[int, CategoryImport]]):
+    parent_ids = {row.parent_id for _, row in rows if row.parent_id}
+    existing = {cid for (cid,) in db.query(Category.id).filter(Category.id.in_(parent_ids)).all()}
+    taken = {name for (name,) in db.query(Category.name).filter(Category.name.in_({row.name for _, row in rows})).all()}
+
+    errors, pending = [], []
+    for line, row in rows:
+        if row.name in taken:
+            errors.append({"line": line, "error": "Categoria já existe."})
+        else:
+            taken.add(row.name)
+            pending.append((line, row))
+
+    # Ordem topológica, em níveis: o pai pode vir depois da filha no mesmo lote. Cada passada
+    # aceita as linhas cujo pai já existia antes dela; o que sobra tem pai inexistente (ou um ciclo)
+    values, levels = [], []
+    while pending:
+        level, waiting = [], []
+        for line, row in pending:
+            if row.parent_id and row.parent_id not in existing:
+                waiting.append((line, row))
+            else:
+                level.append(len(values))
+                values.append(row.model_dump())
+        if not level:
+            errors += [{"line": line, "error": "Categoria pai não encontrada."} for line, _ in waiting]
+            break
+        existing.update(values[position]["id"] for position in level if values[position]["id"])
+        levels.append(level)
+        pending = waiting
+    errors.sort(key=lambda error: error["line"])
+
+    # Pais antes das filhas: a chave estrangeira e a closure table do pai já existem ao ligar a filha
+    category_ids = _bulk_insert(db, Category, values)
+    for level in levels:
+        _link_categories(db, [category_ids[position] for position in level])
+    touch_versions(db, "categories")
+    record_change(db, "categories", "created", *category_ids)
+    return len(values), errors
+
+def _import_tags(db: Session, rows: List[Tuple[int, TagImport]]):
+    taken = {name for (name,) in db.query(TagType.name).filter(TagType.name.in_({row.name for _, row in rows})).all()}
+
+    errors, valid = [], []
+    for line, row in rows:
+        if row.name in taken:
+            errors.append({"line": line, "error": "Uma tag com esse nome já existe."})
+        else:
+            taken.add(row.name)
+            valid.append(row)
+
+    tag_ids = _bulk_insert(db, TagType, [
+        {"id": row.id, "name": row.name, "is_mandatory": row.is_mandatory} for row in valid
+    ])
+    options = []
+    for tag_id, row in zip(tag_ids, valid):
+        for option in row.options:
+            option = option if isinstance(option, TagOptionImport) else TagOptionImport(name=option)
+            options.append({"id": option.id, "name": option.name, "tag_type_id": tag_id})
+    _bulk_insert(db, TagOption, options)
+
+    touch_versions(db, "tags")
+    record_change(db, "tags", "created", *tag_ids)
+    return len(valid), errors
+
+def _import_posts(db: Session, rows: List[Tuple[int, PostImport]]):
+    # Categorias e opções de tag de todo o lote são validadas com uma consulta cada
+    category_ids = {row.category_id for _, row in rows if row.category_id}
+    option_ids = {option_id for _, row in rows for option_id in row.tag_option_ids}
+    existing_categories = {cid for (cid,) in db.query(Category.id).filter(Category.id.in_(category_ids)).all()}
+    existing_options = {oid for (oid,) in db.query(TagOption.id).filter(TagOption.id.in_(option_ids)).all()}
+
+    errors, valid, values = [], [], []
+    for line, row in rows:
+        if row.category_id and row.category_id not in existing_categories:
+            errors.append({"line": line, "error": "Categoria não encontrada."})
+            continue
+        if not set(row.tag_option_ids) <= existing_options:
+            errors.append({"line": line, "error": "Uma ou mais tags não foram encontradas."})
+            continue
+
+        content = row.content if isinstance(row.content, str) else json.dumps(row.content)
+        plain_text = extract_text(content)
+        valid.append((row, plain_text))
+        values.append({
+            "id": row.id,
+            "title": row.title,
+            "content": content,
+            "plain_text": plain_text,
+            "excerpt": make_excerpt(plain_text),
+            "content_html": render_html(content),
+            "content_hash": content_hash(content),
+            "category_id": row.category_id
+        })
+
+    post_ids = _bulk_insert(db, Post, values)
+    associations = [
+        {"post_id": post_id, "tag_option_id": option_id}
+        for post_id, (row, _) in zip(post_ids, valid)
+        for option_id in set(row.tag_option_ids)
+    ]
+    if associations:
+        db.execute(insert(post_tag_options), associations)
+
+    search_index.index_posts(db, [(post_id, row.title, plain_text) for post_id, (row, plain_text) in zip(post_ids, valid)])
+    touch_versions(db, "posts")
+    record_change(db, "posts", "created", *post_ids)
+    return len(values), errors
+
+BULK_IMPORTERS = {
+    "categories": (CategoryImport, _import_categories),
+    "tags": (TagImport, _import_tags),
+    "posts": (PostImport, _import_posts),
+}
+
+def bulk_import(db: Session, resource: str, rows: List[Tuple[int, object]]):
+    """
+    Importa um lote já validado pelo schema em uma única transação.
+    Devolve (quantidade inserida, erros por linha). Se o banco recusar o lote
+    (ex.: id repetido), nada do lote é gravado e todas as linhas voltam como erro.
+    """
+    _, importer = BULK_IMPORTERS[resource]
+    try:
+        inserted, errors = importer(db, rows)
+        tables = {"categories": ["categories"], "tags": ["tag_types", "tag_options"], "posts": ["posts"]}[resource]
+        _sync_sequences(db, *tables)
+        db.commit()
+    except IntegrityError as error:
+        db.rollback()
+        detail = str(error.orig).splitlines()[0]
+        return 0, [{"line": line, "error": f"Lote recusado pelo banco: {detail}"} for line, _ in rows]
+
+    return inserted, errors
+
+def export_categories(db: Session, after: int, limit: int = BULK_CHUNK_SIZE) -> List[dict]:
+    rows = db.query(Category.id, Category.name, Category.parent_id, Category.image_url)\
+             .filter(Category.id > after)\
+             .order_by(Category.id)\
+             .limit(limit)\
+             .all()
+    return [row._asdict() for row in rows]
+
+def export_tags(db: Session, after: int, limit: int = BULK_CHUNK_SIZE) -> List[dict]:
+    tags = db.query(TagType.id, TagType.name, TagType.is_mandatory)\
+             .filter(TagType.id > after)\
+             .order_by(TagType.id)\
+             .limit(limit)\
+             .all()
+    options = defaultdict(list)
+    if tags:
+        for option in db.query(TagOption.id, TagOption.name, TagOption.tag_type_id)\
+                        .filter(TagOption.tag_type_id.in_([tag.id for tag in tags]))\
+                        .order_by(TagOption.id):
+            options[option.tag_type_id].append({"id": option.id, "name": option.name})
+    return [{**tag._asdict(), "options": options[tag.id]} for tag in tags]
+
+def export_posts(db: Session, after: int, limit: int = BULK_CHUNK_SIZE) -> List[dict]:
+    posts = db.query(Post.id, Post.title, Post.content, Post.category_id)\
+              .filter(Post.id > after)\
+              .order_by(Post.id)\
+              .limit(limit)\
+              .all()
+    option_ids = defaultdict(list)
+    if posts:
+        associations = db.execute(
+            select(post_tag_options.c.post_id, post_tag_options.c.tag_option_id)
+            .where(post_tag_options.c.post_id.in_([post.id for post in posts]))
+        )
+        for post_id, option_id in associations:
+            option_ids[post_id].append(option_id)
+    return [
+        {
+            "id": post.id,
+            "title": post.title,
+            "content": post.content if isinstance(post.content, str) else json.dumps(post.content),
+            "category_id": post.category_id,
+            "tag_option_ids": option_ids[post.id]
+        }
+        for post in posts
+    ]
+
+BULK_EXPORTERS = {
+    "categories": export_categories,
+    "tags": export_tags,
+    "posts": export_posts,
+}
@@ -1,12 +1,474 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError, OperationalError, SQLAlchemyError
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+from starlette.concurrency import run_in_threadpool
+from fastapi import Request
 from dotenv import load_dotenv
+from typing import Optional, Union
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+import asyncio
+import itertools
+import logging
+import threading
+import time
 import os
 
+# O .env é carregado só aqui, antes dos módulos do servidor que leem variáveis na importação
+# (auth, cache, metrics...). O main importa o database antes de qualquer outro módulo.
 load_dotenv()
 
+from auth import is_authorized  # noqa: E402
+import cache  # noqa: E402
+import metrics  # noqa: E402
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "")
+# Réplicas de leitura, separadas por vírgula. Vazio = tudo vai para o primário.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Por quanto tempo uma réplica que falhou fica fora da rotação antes de ser testada de novo
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+# DB_ASYNC=true faz as rotas usarem AsyncSession (asyncpg/aiosqlite) em vez do threadpool.
+# O engine síncrono continua existindo para as ferramentas (tools/).
+ASYNC_MODE = _env_bool("DB_ASYNC", "false")
+
+# Pool de conexões (por processo/worker)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recicla conexões antigas e testa antes de usar: evita erros em massa depois de um failover
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "true")
+# Tempo máximo de cada statement no Postgres (0 = sem limite)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+#! ------------------------- MÉTRICAS DO POOL -------------------------
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+pool_metrics: dict[str, PoolMetrics] = {}
+
+
+class _MeteredPoolMixin:
+    # Mede quanto tempo cada checkout esperou por uma conexão livre (inclui o pre-ping)
+    metrics: PoolMetrics
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class MeteredQueuePool(_MeteredPoolMixin, QueuePool):
+    pass
+
+
+class MeteredAsyncPool(_MeteredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _engine_options(url: str, is_async: bool) -> dict:
+    parsed = make_url(url)
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+
+    # SQLite em memória usa um pool próprio, que não aceita essas opções
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options
+
+    options.update(
+        poolclass=MeteredAsyncPool if is_async else MeteredQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+
+    if DB_STATEMENT_TIMEOUT_MS and parsed.get_backend_name() == "postgresql":
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+
+    return options
+
+
+def _attach_metrics(engine, name: str):
+    pool = engine.pool
+    if isinstance(pool, _MeteredPoolMixin):
+        pool.metrics = pool_metrics.setdefault(name, PoolMetrics())
+    return engine
+
+
+def _keep_json_as_text(engine):
+    # O psycopg2 decodifica colunas JSON em dict por padrão; o conteúdo dos posts já é
+    # servido como string JSON, então o texto do banco passa direto (sem loads + dumps)
+    if engine.dialect.name != "postgresql" or engine.dialect.driver != "psycopg2":
+        return engine
+
+    import psycopg2.extras
+
+    @event.listens_for(engine, "connect")
+    def register_json_passthrough(dbapi_connection, connection_record):
+        psycopg2.extras.register_default_json(dbapi_connection, loads=lambda value: value)
+        psycopg2.extras.register_default_jsonb(dbapi_connection, loads=lambda value: value)
+
+    return engine
+
+
+def _instrument(engine):
+    # Tempo e texto de cada statement, para as métricas da requisição atual
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        metrics.record_statement(statement, time.perf_counter() - conn.info["query_start"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def drop_timer(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    return engine
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _count_rows(orm_execute_state):
+    # Linhas buscadas pelas sessões (inclusive as cargas de relacionamento), só com
+    # METRICS_COUNT_ROWS: o resultado é congelado (FrozenResult), contado e devolvido como um
+    # resultado novo. Leituras em streaming (yield_per/stream_results) não são contadas
+    if not metrics.COUNT_ROWS or not orm_execute_state.is_select or metrics.current_stats() is None:
+        return None
+    options = orm_execute_state.execution_options
+    if options.get("yield_per") or options.get("stream_results"):
+        return None
+    frozen = orm_execute_state.invoke_statement().freeze()
+    metrics.record_rows(len(frozen.data))
+    return frozen()
+
+
+def make_engine(url: str, name: str):
+    engine = create_engine(url, **_engine_options(url, is_async=False))
+    return _attach_metrics(_instrument(_keep_json_as_text(engine)), name)
+
+
+def make_async_engine(url: str, name: str):
+    async_engine = create_async_engine(url, **_engine_options(url, is_async=True))
+    _attach_metrics(_instrument(async_engine.sync_engine), name)
+    return async_engine
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+def pool_stats() -> dict:
+    # Antes do primeiro uso não há engine (nem pool) para medir
+    if engine is None:
+        return {}
+    engines = {"primary": engine}
+    if async_engine is not None:
+        engines["primary_async"] = async_engine.sync_engine
+    for replica in replicas.members:
+        engines[replica.name] = getattr(replica.engine, "sync_engine", replica.engine)
+
+    stats = {}
+    for name, current in engines.items():
+        pool = current.pool
+        entry = {"status": pool.status()}
+        if isinstance(pool, QueuePool):
+            entry.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        counters = pool_metrics.get(name)
+        if counters is not None:
+            entry.update(
+                checkouts=counters.checkouts,
+                timeouts=counters.timeouts,
+                wait_seconds_total=round(counters.wait_seconds_total, 6),
+                wait_seconds_max=round(counters.wait_seconds_max, 6),
+            )
+        stats[name] = entry
+
+    for replica in replicas.members:
+        stats[replica.name]["healthy"] = replica.is_healthy()
+    return stats
+
+
+@contextmanager
+def count_queries(bind):
+    # Conta os statements enviados ao banco pelo engine dentro do bloco
+    counter = {"count": 0}
+
+    def before_execute(*args):
+        counter["count"] += 1
+
+    bind = getattr(bind, "sync_engine", bind)
+    event.listen(bind, "before_cursor_execute", before_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(bind, "before_cursor_execute", before_execute)
+
+
+#! ---------------------------- ENGINES ----------------------------
+# Os engines são criados na primeira vez que alguém precisa deles (startup da aplicação,
+# primeira sessão ou uma ferramenta), nunca na importação: importar os modelos (Alembic,
+# scripts, workers subindo) não monta pool nem carrega driver de banco.
 Base = declarative_base()
+SessionLocal = sessionmaker(autoflush=False, autocommit=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+engine = None
+async_engine = None
+replicas = None
+_engines_lock = threading.Lock()
+
+DbSession = Union[Session, AsyncSession]
+
+
+def get_engine():
+    """
+    Devolve o engine síncrono do primário, criando os engines (primário, async e réplicas)
+    na primeira chamada. Seguro para chamar de várias threads.
+    """
+    global engine, async_engine, replicas
+    if engine is not None:
+        return engine
+    with _engines_lock:
+        if engine is None:
+            primary = make_engine(DATABASE_URL, "primary")
+            SessionLocal.configure(bind=primary)
+            if ASYNC_MODE:
+                async_engine = make_async_engine(os.getenv("DATABASE_ASYNC_URL") or async_url(DATABASE_URL), "primary_async")
+                AsyncSessionLocal.configure(bind=async_engine)
+            replicas = ReplicaSet(DATABASE_REPLICA_URLS)
+            # Por último: quem vê o engine preenchido vê o resto pronto
+            engine = primary
+    return engine
+
+
+async def dispose_engines():
+    # Fecha as conexões de todos os pools (shutdown da aplicação)
+    global engine, async_engine, replicas
+    with _engines_lock:
+        current, current_async, current_replicas = engine, async_engine, replicas
+        engine = async_engine = replicas = None
+    if current is None:
+        return
+    for replica in current_replicas.members:
+        if isinstance(replica.engine, AsyncEngine):
+            await replica.engine.dispose()
+        else:
+            replica.engine.dispose()
+    if current_async is not None:
+        await current_async.dispose()
+    current.dispose()
+
+
+async def ping(timeout: float = 2.0) -> Optional[str]:
+    # SELECT 1 no primário (readiness): None se respondeu, senão a descrição do erro
+    get_engine()
+
+    async def check():
+        if async_engine is not None:
+            async with async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        else:
+            def select_one():
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            await run_in_threadpool(select_one)
+
+    try:
+        await asyncio.wait_for(check(), timeout)
+    except asyncio.TimeoutError:
+        return f"sem resposta em {timeout}s"
+    except (SQLAlchemyError, OSError) as error:
+        return f"{type(error).__name__}: {error}".splitlines()[0]
+    return None
+
+
+#! ---------------------------- RÉPLICAS ----------------------------
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        if ASYNC_MODE:
+            self.engine = make_async_engine(async_url(url), name)
+            self.session_factory = async_sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+        else:
+            self.engine = make_engine(url, name)
+            self.session_factory = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
+        # Começa como "não verificada": o primeiro pick faz o health check antes de usar
+        self.down_until = -1.0
+
+    def is_healthy(self) -> bool:
+        return self.down_until == 0.0
+
+    def mark_down(self):
+        logger.warning("Réplica %s fora da rotação por %ss", self.name, REPLICA_RETRY_SECONDS)
+        self.down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+
+    async def probe(self) -> bool:
+        # Health check: SELECT 1 antes de devolver a réplica para a rotação
+        try:
+            if ASYNC_MODE:
+                async with self.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            else:
+                def check():
+                    with self.engine.connect() as conn:
+                        conn.execute(text("SELECT 1"))
+                await run_in_threadpool(check)
+        except (SQLAlchemyError, OSError, asyncio.TimeoutError) as error:
+            # Erro do driver, timeout do pool, falha de rede ou de DNS: qualquer falha é "fora do ar"
+            logger.warning("Health check da réplica %s falhou: %r", self.name, error)
+            self.mark_down()
+            return False
+        self.down_until = 0.0
+        return True
+
+
+class ReplicaSet:
+    def __init__(self, urls: list[str]):
+        self.members = [Replica(f"replica_{index}", url) for index, url in enumerate(urls)]
+        self._cycle = itertools.cycle(self.members) if self.members else None
+
+    async def pick(self) -> Optional[Replica]:
+        # Round-robin entre as réplicas saudáveis; None quando nenhuma está disponível
+        now = time.monotonic()
+        for _ in range(len(self.members)):
+            replica = next(self._cycle)
+            if replica.is_healthy():
+                return replica
+            if replica.down_until <= now and await replica.probe():
+                return replica
+        return None
+
+
+async def _close(db: DbSession):
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        await run_in_threadpool(db.close)
+
+
+def _primary_session() -> DbSession:
+    get_engine()
+    return AsyncSessionLocal() if ASYNC_MODE else SessionLocal()
+
+
+async def get_db():
+    # Dependência de sessão no primário (escritas e leituras que precisam do dado mais recente)
+    db = _primary_session()
+    try:
+        yield db
+    finally:
+        await _close(db)
+
+
+def pinned_to_primary(request: Request) -> bool:
+    # Leituras autenticadas (painel admin) vão sempre para o primário,
+    # para o admin ver na hora o que acabou de escrever (read-your-writes).
+    # O token é validado: um cabeçalho qualquer não fura o cache nem as réplicas.
+    return is_authorized(request.headers.get("authorization"))
+
+
+@asynccontextmanager
+async def read_session(primary: bool = False):
+    # Sessão de leitura: usa uma réplica quando houver (ou o primário, se pedido/indisponível)
+    get_engine()
+    replica = None if primary else await replicas.pick()
+    db = replica.session_factory() if replica else _primary_session()
+    try:
+        yield db
+    except DBAPIError as error:
+        if replica and (error.connection_invalidated or isinstance(error, OperationalError)):
+            replica.mark_down()
+        raise
+    finally:
+        await _close(db)
+
+
+class ReadSession:
+    """
+    Sessão de leitura aberta só no primeiro run_db. Uma leitura respondida pelo cache
+    não escolhe réplica, não pega conexão e não passa pelo threadpool para fechar a sessão.
+    Carregando o cache logo depois de uma escrita, a sessão é do primário (cache.primary_reads).
+    """
+
+    def __init__(self, primary: bool = False):
+        self.primary = primary
+        self._session: Optional[DbSession] = None
+        self._stack = AsyncExitStack()
+
+    async def session(self) -> DbSession:
+        if self._session is None:
+            primary = self.primary or cache.primary_reads()
+            self._session = await self._stack.enter_async_context(read_session(primary))
+        return self._session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._stack.__aexit__(*exc_info)
+
+
+async def get_read_db(request: Request):
+    # Dependência das rotas somente leitura
+    async with ReadSession(primary=pinned_to_primary(request)) as db:
+        yield db
+
+
+async def run_db(db: Union[DbSession, ReadSession], fn, *args, **kwargs):
+    # Executa uma função do crud (que recebe uma Session síncrona) sem bloquear o event loop:
+    # no modo async roda dentro da AsyncSession, no modo síncrono vai para o threadpool.
+    if isinstance(db, ReadSession):
+        db = await db.session()
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
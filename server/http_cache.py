@@ -0,0 +1,76 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+
+# Cache-Control das rotas de leitura. Por padrão o cliente sempre revalida (max-age=0),
+# mas um CDN/proxy pode servir a cópia antiga enquanto revalida em segundo plano.
+MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))
+STALE_WHILE_REVALIDATE = int(os.getenv("HTTP_CACHE_STALE_WHILE_REVALIDATE", "60"))
+CACHE_CONTROL = os.getenv(
+    "HTTP_CACHE_CONTROL",
+    f"public, max-age={MAX_AGE}, stale-while-revalidate={STALE_WHILE_REVALIDATE}"
+)
+# Requisições com Authorization (painel admin): só o navegador guarda, e sempre revalida.
+# O "public" acima faria um CDN/proxy guardar a resposta e servi-la a qualquer um.
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+# O corpo varia com a compressão e a resposta com o login: vai no 200 e no 304
+VARY = "Accept-Encoding, Authorization"
+
+
+def make_etag(*parts) -> str:
+    # ETag forte: mesma versão do recurso + mesmos parâmetros = mesmo corpo
+    key = "|".join(str(part) for part in parts)
+    return '"%s"' % hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def _http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional(request: Request, response: Response, etag: str,
+                last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """
+    Coloca ETag/Last-Modified/Cache-Control na resposta. Se o cliente já tem essa
+    versão (If-None-Match ou If-Modified-Since), devolve a resposta 304 a ser retornada.
+    """
+    cache_control = PRIVATE_CACHE_CONTROL if "authorization" in request.headers else CACHE_CONTROL
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": VARY}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = etag_matches(if_none_match, etag)
+    elif if_modified_since is not None and last_modified is not None:
+        not_modified = _not_modified_since(if_modified_since, last_modified)
+    else:
+        not_modified = False
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
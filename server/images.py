@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import os
+import re
+from io import BytesIO
+from typing import Optional
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # o Pillow é opcional: sem ele a imagem original é servida sem variantes
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Pasta dos arquivos de imagem (originais e variantes), servidos em /images/<hash>.<ext>
+IMAGE_DIR = os.getenv("IMAGE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "media"))
+IMAGE_URL_PREFIX = "/images"
+# Larguras das variantes geradas; nenhuma passa da largura original
+IMAGE_WIDTHS = tuple(sorted({int(width) for width in os.getenv("IMAGE_WIDTHS", "160,320,640,1280").split(",") if width.strip()}))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(5 * 1024 * 1024)))
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "82"))
+
+# O nome é o hash do conteúdo: um arquivo nunca muda depois de publicado
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp"}
+_NAME = re.compile(r"^([0-9a-f]{32})\.(jpg|png|gif|webp)$")
+
+
+def _sniff(data: bytes) -> Optional[str]:
+    # Formato pelos primeiros bytes (o content-type do upload vem do navegador e não é confiável)
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def _store(data: bytes, extension: str) -> str:
+    # Grava com o hash do conteúdo no nome e devolve a URL; o mesmo arquivo nunca é gravado duas vezes
+    name = f"{hashlib.sha256(data).hexdigest()[:32]}.{extension}"
+    path = os.path.join(IMAGE_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(IMAGE_DIR, exist_ok=True)
+        # Escrita atômica: quem pedir o arquivo no meio da gravação não recebe metade dele
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+    return f"{IMAGE_URL_PREFIX}/{name}"
+
+
+def file_path(name: str) -> Optional[tuple[str, str, str]]:
+    # (caminho, media type, ETag) de um arquivo servido em /images, ou None se o nome não for válido
+    match = _NAME.match(name)
+    path = os.path.join(IMAGE_DIR, name)
+    if match is None or not os.path.isfile(path):
+        return None
+    return path, MEDIA_TYPES[match.group(2)], f'"{match.group(1)}"'
+
+
+async def save_upload(upload: UploadFile) -> str:
+    # Valida e grava a imagem enviada; as variantes ficam para depois da resposta (generate_variants)
+    data = await upload.read(IMAGE_MAX_BYTES + 1)
+    if len(data) > IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"A imagem passa do limite de {IMAGE_MAX_BYTES // (1024 * 1024)}MB.")
+    extension = _sniff(data)
+    if extension is None:
+        raise HTTPException(status_code=400, detail="Formato de imagem não suportado (use JPEG, PNG, WebP ou GIF).")
+    return await run_in_threadpool(_store, data, extension)
+
+
+#! ------------------------- VARIANTES -------------------------
+def _encode(image, image_format: str) -> bytes:
+    buffer = BytesIO()
+    if image_format == "JPEG":
+        image.convert("RGB").save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image = image if image.mode in ("RGB", "RGBA") else image.convert("RGBA")
+        image.save(buffer, "WEBP", quality=WEBP_QUALITY, method=6)
+    return buffer.getvalue()
+
+
+def generate_variants(image_url: str) -> Optional[dict]:
+    """
+    Gera as variantes redimensionadas (WebP e JPEG) de uma imagem gravada por save_upload e
+    devolve os srcset ({"image_srcset": JPEG, "image_webp_srcset": WebP}). None sem o Pillow.
+    """
+    if Image is None:
+        logger.warning("Pillow não instalado: %s fica sem variantes", image_url)
+        return None
+    found = file_path(image_url.rsplit("/", 1)[-1])
+    if found is None or not IMAGE_WIDTHS:
+        return None
+
+    srcsets = {"JPEG": [], "WEBP": []}
+    with Image.open(found[0]) as original:
+        # Fotos de celular vêm deitadas com a rotação só no EXIF
+        original = ImageOps.exif_transpose(original)
+        widths = sorted({width for width in IMAGE_WIDTHS if width < original.width} | {min(original.width, IMAGE_WIDTHS[-1])})
+        for width in widths:
+            height = max(1, round(original.height * width / original.width))
+            resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+            for image_format, extension in (("JPEG", "jpg"), ("WEBP", "webp")):
+                url = _store(_encode(resized, image_format), extension)
+                srcsets[image_format].append(f"{url} {width}w")
+
+    return {"image_srcset": ", ".join(srcsets["JPEG"]), "image_webp_srcset": ", ".join(srcsets["WEBP"])}
+
+
+def process_category_image(category_id: int, image_url: str):
+    # Roda depois da resposta (BackgroundTasks): gera as variantes e grava os srcset na categoria
+    from database import SessionLocal
+    import crud
+
+    try:
+        variants = generate_variants(image_url)
+    except Exception:
+        logger.exception("Falha ao gerar as variantes de %s", image_url)
+        return
+    if not variants:
+        return
+
+    db = SessionLocal()
+    try:
+        crud.set_category_image_variants(db, category_id, image_url, variants)
+    finally:
+        db.close()
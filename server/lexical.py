@@ -0,0 +1,135 @@
+import hashlib
+import json
+from html import escape
+from typing import Any, Optional
+
+EXCERPT_LENGTH = 200
+
+# Formatos de texto do Lexical (bitmask em node["format"]) -> tags HTML
+_TEXT_FORMATS = [
+    (1, "strong"),
+    (2, "em"),
+    (4, "s"),
+    (8, "u"),
+    (16, "code"),
+    (32, "sub"),
+    (64, "sup"),
+]
+
+# Mesmas classes do tema do editor no cliente
+_TEXT_CLASSES = {1: "editor-bold", 2: "editor-italic", 8: "editor-underline", 16: "editor-code"}
+
+_HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+_SAFE_URL_PREFIXES = ("http://", "https://", "mailto:", "/", "#")
+
+
+def _collect_text(node: Any, parts: list[str]):
+    if not isinstance(node, dict):
+        return
+
+    text = node.get("text")
+    if isinstance(text, str) and text:
+        parts.append(text)
+
+    children = node.get("children") or []
+    for child in children:
+        _collect_text(child, parts)
+
+    # Separa os blocos (parágrafos, títulos, citações...) por quebra de linha
+    if children and node.get("type") not in ("text", "link", "root"):
+        parts.append("\n")
+
+
+def _root(content: Any) -> Optional[dict]:
+    if isinstance(content, dict):
+        data = content
+    else:
+        try:
+            data = json.loads(content)
+        except (TypeError, json.JSONDecodeError):
+            return None
+    root = data.get("root") if isinstance(data, dict) else None
+    return root if isinstance(root, dict) else None
+
+
+def content_hash(content: Any) -> str:
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def extract_text(content: Any) -> str:
+    # Converte o JSON do editor Lexical em texto puro (apenas os nós "text")
+    root = _root(content)
+    if root is None:
+        return content if isinstance(content, str) else ""
+
+    parts: list[str] = []
+    _collect_text(root, parts)
+
+    lines = " ".join(parts).split("\n")
+    return "\n".join(" ".join(line.split()) for line in lines if line.strip())
+
+
+def make_excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    text = " ".join(text.split())
+    if len(text) <= length:
+        return text
+    return text[:length].rsplit(" ", 1)[0] + "…"
+
+
+def _render_text(node: dict) -> str:
+    html = escape(node.get("text") or "")
+    fmt = node.get("format") if isinstance(node.get("format"), int) else 0
+    for bit, tag in _TEXT_FORMATS:
+        if fmt & bit:
+            css = _TEXT_CLASSES.get(bit)
+            opening = f'<{tag} class="{css}">' if css else f"<{tag}>"
+            html = f"{opening}{html}</{tag}>"
+    return html
+
+
+def _render_children(node: dict) -> str:
+    return "".join(_render_node(child) for child in node.get("children") or [] if isinstance(child, dict))
+
+
+def _render_node(node: dict) -> str:
+    # Só gera tags conhecidas e escapa todo texto/atributo: o HTML sai sanitizado por construção
+    node_type = node.get("type")
+    if node_type == "text" or (node_type is None and "text" in node):
+        return _render_text(node)
+    if node_type == "linebreak":
+        return "<br>"
+    if node_type == "tab":
+        return "\t"
+
+    inner = _render_children(node)
+    if node_type == "paragraph":
+        return f'<p class="editor-paragraph">{inner}</p>'
+    if node_type == "heading":
+        tag = node.get("tag") if node.get("tag") in _HEADING_TAGS else "h2"
+        return f"<{tag}>{inner}</{tag}>"
+    if node_type == "quote":
+        return f"<blockquote>{inner}</blockquote>"
+    if node_type == "list":
+        tag = "ol" if node.get("listType") == "number" else "ul"
+        return f"<{tag}>{inner}</{tag}>"
+    if node_type == "listitem":
+        return f"<li>{inner}</li>"
+    if node_type == "code":
+        return f'<pre class="editor-code"><code>{inner}</code></pre>'
+    if node_type in ("link", "autolink"):
+        url = node.get("url") or ""
+        if not isinstance(url, str) or not url.lower().startswith(_SAFE_URL_PREFIXES):
+            return inner
+        return f'<a href="{escape(url)}" rel="noopener noreferrer">{inner}</a>'
+    # Nó desconhecido: mantém só o conteúdo
+    return inner
+
+
+def render_html(content: Any) -> str:
+    # Converte o JSON do editor Lexical em HTML sanitizado (feito na escrita do post)
+    root = _root(content)
+    if root is None:
+        return f'<p class="editor-paragraph">{escape(content)}</p>' if isinstance(content, str) and content else ""
+    return _render_children(root)
@@ -1,40 +1,98 @@
-from fastapi import FastAPI, Request, HTTPException, status
-from database import engine, Base
-from routes import posts, categories, tags
-from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+import time
+
+_import_started = time.perf_counter()
+
+import logging
 import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+import database
+from database import pool_stats
+from routes import posts, categories, tags, bulk, facets, images, changes
+from fastapi.middleware.cors import CORSMiddleware
+from compression import CompressionMiddleware
+from auth import AuthMiddleware
+import metrics
+import outbox
+from responses import DefaultResponse
+
+logger = logging.getLogger(__name__)
+
+# O schema é do Alembic (alembic upgrade head). DB_CREATE_SCHEMA=true cria as tabelas
+# direto dos modelos no startup, só para um SQLite local de desenvolvimento.
+DB_CREATE_SCHEMA = os.getenv("DB_CREATE_SCHEMA", "false").lower() in ("1", "true", "yes")
+
+# Tempos de importação e de startup deste worker (também no /health)
+timings = {"import_ms": None, "startup_ms": None}
+
+
+def _create_schema():
+    import search
 
-load_dotenv()
+    engine = database.get_engine()
+    database.Base.metadata.create_all(bind=engine)
+    search.create_index(engine)
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    database.get_engine()
+    if DB_CREATE_SCHEMA:
+        _create_schema()
+    # Abre a primeira conexão agora: a primeira requisição não paga o connect
+    error = await database.ping()
+    if error:
+        logger.warning("Banco indisponível no startup: %s", error)
+    else:
+        try:
+            await run_in_threadpool(outbox.prune)
+        except Exception:
+            logger.exception("Falha ao apagar eventos antigos do feed de alterações")
+    timings["startup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("Worker pronto: importação em %sms, startup em %sms", timings["import_ms"], timings["startup_ms"])
+    yield
+    await database.dispose_engines()
 
-@app.middleware("http")
-async def token_middleware(request: Request, call_next):
-    # Verifica se o método da requisição é POST, PUT ou DELETE
-    if request.method in ("POST", "PUT", "DELETE"):
-        auth_header = request.headers.get("Authorization")
-        if not auth_header:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token não fornecido")
-        
-        # Extrai o token; espera-se o formato "Bearer <token>"
-        if "Bearer " in auth_header:
-            token = auth_header.split("Bearer ")[1]
-        else:
-            token = auth_header
 
-        expected_token = os.getenv("AUTH_TOKEN")
-        if token != expected_token:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token inválido")
-    
-    response = await call_next(request)
-    return response
+app = FastAPI(default_response_class=DefaultResponse, lifespan=lifespan)
+
+# Token do admin nas escritas (POST/PUT/PATCH/DELETE)
+app.add_middleware(AuthMiddleware)
 
 @app.get("/")
 def read_root():
     return {"message": "Backend está rodando"}
 
+@app.get("/health")
+async def read_health():
+    # Readiness: 200 só se o banco responde; 503 tira o worker do balanceador
+    error = await database.ping()
+    body = {
+        "status": "ok" if error is None else "unavailable",
+        "database": error or "ok",
+        "timings": timings,
+    }
+    return ORJSONResponse(body, status_code=200 if error is None else 503, headers={"Cache-Control": "no-store"})
+
+@app.get("/metrics/pool")
+def read_pool_metrics():
+    # Checkouts, espera por conexão e ocupação dos pools deste worker
+    return pool_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    # Formato do Prometheus: requisições, banco, serialização e pools deste worker
+    return PlainTextResponse(metrics.render(pool_stats()), media_type="text/plain; version=0.0.4")
+
+# gzip/brotli conforme o Accept-Encoding (fica por dentro do CORS)
+app.add_middleware(CompressionMiddleware)
+
+# Server-Timing, /metrics e log de requisições lentas (por fora da compressão, para medi-la junto)
+app.add_middleware(metrics.TimingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -43,8 +101,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-Base.metadata.create_all(bind=engine)
-
 app.include_router(posts.router)
 app.include_router(categories.router)
-app.include_router(tags.router)
\ No newline at end of file
+app.include_router(tags.router)
+app.include_router(bulk.router)
+app.include_router(facets.router)
+app.include_router(images.router)
+app.include_router(changes.router)
+
+timings["import_ms"] = round((time.perf_counter() - _import_started) * 1000, 1)
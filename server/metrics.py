@@ -0,0 +1,269 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+# Requisições mais lentas que isso vão para o log com os statements que rodaram
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+# Statements mais lentos que isso são logados na hora (0 = desligado)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Limite de statements guardados por requisição para o log de requisição lenta
+SLOW_LOG_MAX_STATEMENTS = 50
+# Conta as linhas buscadas (Server-Timing, log de requisição lenta e db_rows_fetched_total).
+# Desligado por padrão: a contagem materializa cada resultado do ORM (database._count_rows)
+COUNT_ROWS = os.getenv("METRICS_COUNT_ROWS", "false").lower() in ("1", "true", "yes")
+
+# Limites do histograma de duração das requisições, em segundos
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _shorten(statement: str, length: int = 300) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= length else statement[:length] + "…"
+
+
+#! ------------------------- POR REQUISIÇÃO -------------------------
+class RequestStats:
+    # Acumulado de uma requisição: tempo no banco, statements, linhas buscadas e serialização
+    __slots__ = ("db_seconds", "statements", "rows", "serialize_seconds", "queries")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.statements = 0
+        self.rows = 0
+        self.serialize_seconds = 0.0
+        self.queries: list[tuple[float, str]] = []
+
+    def describe(self) -> str:
+        return f"{self.statements} queries, {self.rows} rows" if COUNT_ROWS else f"{self.statements} queries"
+
+    def server_timing(self, total_seconds: float) -> str:
+        return (
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.describe()}", '
+            f"serialize;dur={self.serialize_seconds * 1000:.1f}, "
+            f"app;dur={total_seconds * 1000:.1f}"
+        )
+
+
+# A sessão síncrona roda no threadpool, que copia o contexto: o mesmo objeto chega lá
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def record_statement(statement: str, seconds: float):
+    # Chamado pelos eventos do engine (database.py) depois de cada statement
+    stats = _current.get()
+    if stats is not None:
+        stats.db_seconds += seconds
+        stats.statements += 1
+        if len(stats.queries) < SLOW_LOG_MAX_STATEMENTS:
+            stats.queries.append((seconds, statement))
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Query lenta (%.1fms): %s", seconds * 1000, _shorten(statement))
+
+
+def record_rows(count: int):
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += count
+
+
+@contextmanager
+def serialization():
+    # Mede a conversão da resposta em JSON (Pydantic/orjson)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.serialize_seconds += time.perf_counter() - start
+
+
+#! ------------------------- REGISTRO -------------------------
+class _Registry:
+    """
+    Contadores e histogramas do processo, no formato texto do Prometheus.
+    Com vários workers cada um tem os seus; o Prometheus soma as séries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: dict[str, dict[tuple, float]] = {}
+        self.histograms: dict[str, dict[tuple, list]] = {}
+
+    def inc(self, name: str, labels: tuple, value: float = 1.0):
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0.0) + value
+
+    def observe(self, name: str, labels: tuple, value: float):
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            # [contagem por bucket..., soma, total]
+            data = series.setdefault(labels, [0] * len(DURATION_BUCKETS) + [0.0, 0])
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def snapshot(self) -> tuple[dict, dict]:
+        with self._lock:
+            counters = {name: dict(series) for name, series in self.counters.items()}
+            histograms = {name: {labels: list(data) for labels, data in series.items()}
+                          for name, series in self.histograms.items()}
+        return counters, histograms
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+registry = _Registry()
+
+_HELP = {
+    "http_requests_total": "Requisições atendidas",
+    "http_request_duration_seconds": "Duração das requisições",
+    "http_slow_requests_total": "Requisições acima de SLOW_REQUEST_MS",
+    "db_statements_total": "Statements enviados ao banco",
+    "db_seconds_total": "Tempo gasto executando statements",
+    "db_rows_fetched_total": "Linhas buscadas do banco",
+    "serialization_seconds_total": "Tempo gasto serializando respostas",
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    # Sem notação científica nem arredondamento (o :g corta em 6 dígitos)
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def observe_request(method: str, route: str, status: int, seconds: float, stats: RequestStats, streaming: bool = False):
+    labels = (method, route)
+    registry.inc("http_requests_total", (method, route, status))
+    registry.observe("http_request_duration_seconds", labels, seconds)
+    registry.inc("db_statements_total", labels, stats.statements)
+    registry.inc("db_seconds_total", labels, stats.db_seconds)
+    if COUNT_ROWS:
+        registry.inc("db_rows_fetched_total", labels, stats.rows)
+    registry.inc("serialization_seconds_total", labels, stats.serialize_seconds)
+
+    # Streams (SSE) ficam abertos por definição: não contam como requisição lenta
+    if seconds * 1000 >= SLOW_REQUEST_MS and not streaming:
+        registry.inc("http_slow_requests_total", labels)
+        statements = "\n".join(f"  {duration * 1000:8.1f}ms  {_shorten(sql)}" for duration, sql in stats.queries)
+        logger.warning(
+            "Requisição lenta: %s %s %.1fms (banco %.1fms, %s, serialização %.1fms)\n%s",
+            method, route, seconds * 1000, stats.db_seconds * 1000, stats.describe(),
+            stats.serialize_seconds * 1000, statements
+        )
+
+
+def render(pool: Optional[dict] = None) -> str:
+    # Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)
+    label_names = {
+        "http_requests_total": ("method", "route", "status"),
+    }
+    lines = []
+    counters, histograms = registry.snapshot()
+
+    for name, series in sorted(counters.items()):
+        lines += [f"# HELP {name} {_HELP.get(name, name)}", f"# TYPE {name} counter"]
+        names = label_names.get(name, ("method", "route"))
+        lines += [f"{name}{_labels(names, labels)} {_number(value)}" for labels, value in sorted(series.items())]
+
+    for name, series in sorted(histograms.items()):
+        lines += [f"# HELP {name} {_HELP.get(name, name)}", f"# TYPE {name} histogram"]
+        for labels, data in sorted(series.items()):
+            base = _labels(("method", "route"), labels)[1:-1] + ","
+            for bound, count in zip(DURATION_BUCKETS, data):
+                lines.append(f'{name}_bucket{{{base}le="{bound:g}"}} {count}')
+            lines.append(f'{name}_bucket{{{base}le="+Inf"}} {data[-1]}')
+            lines.append(f"{name}_sum{_labels(('method', 'route'), labels)} {_number(data[-2])}")
+            lines.append(f"{name}_count{_labels(('method', 'route'), labels)} {data[-1]}")
+
+    lines += _render_pool(pool or {})
+    return "\n".join(lines) + "\n"
+
+
+def _render_pool(pool: dict) -> list:
+    # Mesmos números do /metrics/pool, por pool (primário, réplicas)
+    gauges = {
+        "db_pool_size": ("gauge", "size", "Conexões mantidas no pool"),
+        "db_pool_checked_out": ("gauge", "checked_out", "Conexões em uso"),
+        "db_pool_overflow": ("gauge", "overflow", "Conexões além do pool_size"),
+        "db_pool_checkouts_total": ("counter", "checkouts", "Checkouts de conexão"),
+        "db_pool_timeouts_total": ("counter", "timeouts", "Checkouts que estouraram o DB_POOL_TIMEOUT"),
+        "db_pool_wait_seconds_total": ("counter", "wait_seconds_total", "Tempo esperando por conexão"),
+        "db_pool_wait_seconds_max": ("gauge", "wait_seconds_max", "Maior espera por conexão"),
+        "db_replica_healthy": ("gauge", "healthy", "Réplica na rotação (1) ou fora (0)"),
+    }
+    lines = []
+    for name, (kind, key, description) in gauges.items():
+        values = [(pool_name, entry[key]) for pool_name, entry in sorted(pool.items()) if key in entry]
+        if not values:
+            continue
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{pool="{pool_name}"}} {_number(value)}' for pool_name, value in values]
+    return lines
+
+
+#! ------------------------- MIDDLEWARE -------------------------
+class TimingMiddleware:
+    """
+    Mede cada requisição (middleware ASGI puro): duração total, tempo e statements no banco,
+    linhas buscadas (com METRICS_COUNT_ROWS) e serialização. Devolve o resumo no Server-Timing, alimenta o
+    /metrics e loga as requisições acima de SLOW_REQUEST_MS com os statements que rodaram.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+        streaming = False
+
+        async def send_with_timing(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                streaming = headers.get("content-type", "").startswith("text/event-stream")
+                headers.append("Server-Timing", stats.server_timing(time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            # Rota no formato do roteador (/posts/{post_id}): não cria uma série por id
+            route = getattr(scope.get("route"), "path", "unmatched")
+            observe_request(scope["method"], route, status, time.perf_counter() - start, stats, streaming)
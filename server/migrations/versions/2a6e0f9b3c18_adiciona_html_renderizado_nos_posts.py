@@ -0,0 +1,46 @@
+"""Adiciona HTML renderizado nos posts
+
+Revision ID: 2a6e0f9b3c18
+Revises: 8c2f41e5d7a9
+Create Date: 2026-10-18 16:40:05.117392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from lexical import render_html, content_hash
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2a6e0f9b3c18'
+down_revision: Union[str, None] = '8c2f41e5d7a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('content_html', sa.String(), nullable=True))
+    op.add_column('posts', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+    # Renderiza o HTML dos posts que já existem
+    bind = op.get_bind()
+    posts = sa.table(
+        'posts',
+        sa.column('id', sa.Integer),
+        sa.column('content'),
+        sa.column('content_html', sa.String),
+        sa.column('content_hash', sa.String)
+    )
+    for post_id, content in bind.execute(sa.select(posts.c.id, posts.c.content)).all():
+        bind.execute(
+            posts.update()
+            .where(posts.c.id == post_id)
+            .values(content_html=render_html(content), content_hash=content_hash(content))
+        )
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'content_hash')
+    op.drop_column('posts', 'content_html')
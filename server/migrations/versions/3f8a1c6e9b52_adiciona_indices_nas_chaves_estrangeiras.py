@@ -0,0 +1,32 @@
+"""Adiciona índices nas chaves estrangeiras
+
+Revision ID: 3f8a1c6e9b52
+Revises: 9e4b7c2d5a16
+Create Date: 2026-10-18 19:42:08.318604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8a1c6e9b52'
+down_revision: Union[str, None] = '9e4b7c2d5a16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filtro de posts por categoria e contagem dos facets
+    op.create_index('ix_posts_category_id', 'posts', ['category_id'])
+    # Subcategorias de uma categoria (árvore e checagem antes de excluir)
+    op.create_index('ix_categories_parent_id', 'categories', ['parent_id'])
+    # Opções de um tipo de tag (listagem das tags e edição)
+    op.create_index('ix_tag_options_tag_type_id', 'tag_options', ['tag_type_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tag_options_tag_type_id', table_name='tag_options')
+    op.drop_index('ix_categories_parent_id', table_name='categories')
+    op.drop_index('ix_posts_category_id', table_name='posts')
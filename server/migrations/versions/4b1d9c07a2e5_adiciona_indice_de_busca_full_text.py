@@ -0,0 +1,63 @@
+"""Adiciona índice de busca full-text
+
+Revision ID: 4b1d9c07a2e5
+Revises: e307f9b26d00
+Create Date: 2026-10-18 11:02:17.540113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from lexical import extract_text
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1d9c07a2e5'
+down_revision: Union[str, None] = 'e307f9b26d00'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('plain_text', sa.String(), nullable=True))
+
+    # Extrai o texto puro dos posts que já existem
+    bind = op.get_bind()
+    posts = sa.table(
+        'posts',
+        sa.column('id', sa.Integer),
+        sa.column('title', sa.String),
+        sa.column('content'),
+        sa.column('plain_text', sa.String)
+    )
+    rows = bind.execute(sa.select(posts.c.id, posts.c.title, posts.c.content)).all()
+    for post_id, _, content in rows:
+        bind.execute(posts.update().where(posts.c.id == post_id).values(plain_text=extract_text(content)))
+
+    if bind.dialect.name == 'postgresql':
+        # Mesma expressão usada em search._pg_document
+        op.execute(
+            "CREATE INDEX ix_posts_search ON posts USING gin ("
+            "to_tsvector('portuguese'::regconfig, coalesce(posts.title, '') || ' ' || coalesce(posts.plain_text, '')))"
+        )
+    elif bind.dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts "
+            "USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')"
+        )
+        for post_id, title, content in rows:
+            bind.execute(
+                sa.text("INSERT INTO posts_fts (rowid, title, body) VALUES (:id, :title, :body)"),
+                {"id": post_id, "title": title, "body": extract_text(content)}
+            )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_posts_search")
+    elif bind.dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS posts_fts")
+    op.drop_column('posts', 'plain_text')
@@ -0,0 +1,29 @@
+"""Adiciona srcset nas categorias
+
+Revision ID: 8b1f4d2e6c93
+Revises: c5e2d7a4f180
+Create Date: 2026-10-18 22:14:08.517203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1f4d2e6c93'
+down_revision: Union[str, None] = 'c5e2d7a4f180'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Variantes redimensionadas da imagem da categoria (JPEG e WebP)
+    op.add_column('categories', sa.Column('image_srcset', sa.String(), nullable=True))
+    op.add_column('categories', sa.Column('image_webp_srcset', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('categories', 'image_webp_srcset')
+    op.drop_column('categories', 'image_srcset')
@@ -0,0 +1,38 @@
+"""Cria tabela resource_versions
+
+Revision ID: 8c2f41e5d7a9
+Revises: 4b1d9c07a2e5
+Create Date: 2026-10-18 14:27:53.902611
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2f41e5d7a9'
+down_revision: Union[str, None] = '4b1d9c07a2e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    resource_versions = op.create_table(
+        'resource_versions',
+        sa.Column('name', sa.String(), primary_key=True),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False)
+    )
+
+    now = datetime.now(timezone.utc)
+    op.bulk_insert(resource_versions, [
+        {'name': name, 'version': 1, 'updated_at': now}
+        for name in ('posts', 'categories', 'tags')
+    ])
+
+
+def downgrade() -> None:
+    op.drop_table('resource_versions')
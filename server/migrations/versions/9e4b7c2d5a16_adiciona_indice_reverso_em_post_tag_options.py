@@ -0,0 +1,26 @@
+"""Adiciona índice reverso em post_tag_options
+
+Revision ID: 9e4b7c2d5a16
+Revises: 6d3a8e1f0b47
+Create Date: 2026-10-18 17:21:40.093512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b7c2d5a16'
+down_revision: Union[str, None] = '6d3a8e1f0b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A chave primária é (post_id, tag_option_id); o filtro por tag precisa do contrário
+    op.create_index('ix_post_tag_options_tag_option_id', 'post_tag_options', ['tag_option_id', 'post_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_post_tag_options_tag_option_id', table_name='post_tag_options')
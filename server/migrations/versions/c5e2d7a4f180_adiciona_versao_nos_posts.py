@@ -0,0 +1,27 @@
+"""Adiciona versão nos posts
+
+Revision ID: c5e2d7a4f180
+Revises: 3f8a1c6e9b52
+Create Date: 2026-10-18 21:05:33.902417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e2d7a4f180'
+down_revision: Union[str, None] = '3f8a1c6e9b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Controle de concorrência otimista nas edições do painel
+    op.add_column('posts', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'version')
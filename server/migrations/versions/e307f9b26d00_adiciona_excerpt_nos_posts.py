@@ -0,0 +1,38 @@
+"""Adiciona excerpt nos posts
+
+Revision ID: e307f9b26d00
+Revises: cf2ac9fa2f5a
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from lexical import extract_text, make_excerpt
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e307f9b26d00'
+down_revision: Union[str, None] = 'cf2ac9fa2f5a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('excerpt', sa.String(), nullable=True))
+
+    # Preenche o excerpt dos posts que já existem
+    bind = op.get_bind()
+    posts = sa.table('posts', sa.column('id', sa.Integer), sa.column('content'), sa.column('excerpt', sa.String))
+    for post_id, content in bind.execute(sa.select(posts.c.id, posts.c.content)).all():
+        bind.execute(
+            posts.update()
+            .where(posts.c.id == post_id)
+            .values(excerpt=make_excerpt(extract_text(content)))
+        )
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'excerpt')
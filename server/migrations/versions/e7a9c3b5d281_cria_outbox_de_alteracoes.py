@@ -0,0 +1,49 @@
+"""Cria outbox de alterações
+
+Revision ID: e7a9c3b5d281
+Revises: 8b1f4d2e6c93
+Create Date: 2026-10-18 23:02:41.228716
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a9c3b5d281'
+down_revision: Union[str, None] = '8b1f4d2e6c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Eventos das escritas para o feed /changes (SSE e polling)
+    op.create_table(
+        'change_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('resource', sa.String(), nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=True),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sqlite_autoincrement=True
+    )
+    op.create_index(op.f('ix_change_events_created_at'), 'change_events', ['created_at'], unique=False)
+
+    # Linha travada por crud.record_change até o commit: é ela que põe os ids na ordem dos commits
+    resource_versions = sa.table(
+        'resource_versions',
+        sa.column('name', sa.String()),
+        sa.column('version', sa.Integer()),
+        sa.column('updated_at', sa.DateTime(timezone=True))
+    )
+    op.bulk_insert(resource_versions, [{'name': 'changes', 'version': 0, 'updated_at': datetime.now(timezone.utc)}])
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM resource_versions WHERE name = 'changes'")
+    op.drop_index(op.f('ix_change_events_created_at'), table_name='change_events')
+    op.drop_table('change_events')
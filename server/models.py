@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, JSON, ForeignKey, Boolean, Table
+from sqlalchemy import Column, Integer, String, JSON, ForeignKey, Boolean, Table, DateTime, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from database import Base
 
@@ -7,19 +7,33 @@ class Category(Base):
     __tablename__ = "categories"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False, unique=True)
-    parent_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    parent_id = Column(Integer, ForeignKey("categories.id"), nullable=True, index=True)
     image_url = Column(String, nullable=True)
+    # Variantes redimensionadas da imagem (preenchidas depois do upload, ver images.py)
+    image_srcset = Column(String, nullable=True)
+    image_webp_srcset = Column(String, nullable=True)
 
     parent = relationship("Category", remote_side=[id], backref="children")
     posts = relationship('Post', back_populates='category')
 
 
+# Closure table da árvore de categorias: uma linha para cada par (ancestral, descendente),
+# incluindo a própria categoria com depth 0. Mantida pelo crud em create/update/delete.
+class CategoryClosure(Base):
+    __tablename__ = "category_closure"
+    ancestor_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True, index=True)
+    depth = Column(Integer, nullable=False)
+
+
 # Tabela de associação para a relação muitos-para-muitos entre posts e tags
 post_tag_options = Table(
     'post_tag_options',
     Base.metadata,
     Column('post_id', Integer, ForeignKey('posts.id'), primary_key=True),
-    Column('tag_option_id', Integer, ForeignKey('tag_options.id'), primary_key=True)
+    Column('tag_option_id', Integer, ForeignKey('tag_options.id'), primary_key=True),
+    # Índice reverso (opção -> posts) para filtrar posts por tag sem varrer a tabela
+    Index('ix_post_tag_options_tag_option_id', 'tag_option_id', 'post_id')
 )
 
 class Post(Base):
@@ -27,7 +41,16 @@ class Post(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
     content = Column(String, nullable=False)
-    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    # Texto puro extraído do JSON do Lexical na escrita (usado pela busca full-text)
+    plain_text = Column(String, nullable=True)
+    # Resumo em texto puro gerado na escrita, usado nas listagens sem carregar o content
+    excerpt = Column(String, nullable=True)
+    # HTML sanitizado renderizado na escrita e o hash do content que o gerou
+    content_html = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True, index=True)
+    # Controle de concorrência otimista: incrementada a cada edição do post
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     category = relationship("Category", back_populates="posts")
 
@@ -45,7 +68,29 @@ class TagOption(Base):
     __tablename__ = "tag_options"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
-    tag_type_id: Mapped[int] = mapped_column(Integer, ForeignKey("tag_types.id"), nullable=False)
+    tag_type_id: Mapped[int] = mapped_column(Integer, ForeignKey("tag_types.id"), nullable=False, index=True)
     
     tag_type = relationship("TagType", back_populates="options")
     posts = relationship("Post", secondary=post_tag_options, back_populates="tag_options")
+
+
+# Versão de cada recurso ("posts", "categories", "tags"), incrementada a cada escrita.
+# Usada para gerar os ETags/Last-Modified das rotas de leitura sem refazer as consultas.
+class ResourceVersion(Base):
+    __tablename__ = "resource_versions"
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+# Outbox de alterações: um evento por recurso criado/alterado/apagado, gravado na mesma
+# transação da escrita (crud.record_change). O id crescente é o cursor do feed (/changes).
+class ChangeEvent(Base):
+    __tablename__ = "change_events"
+    # Ids nunca reaproveitados, nem com a tabela vazia (no Postgres a sequence já garante)
+    __table_args__ = {"sqlite_autoincrement": True}
+    id = Column(Integer, primary_key=True)
+    resource = Column(String, nullable=False)
+    resource_id = Column(Integer, nullable=True)
+    action = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# Sem aviso de escrita neste worker, os streams SSE consultam o outbox nesse intervalo
+# (escritas feitas por outros workers chegam assim)
+CHANGES_POLL_INTERVAL = float(os.getenv("CHANGES_POLL_INTERVAL", "2"))
+# Comentário enviado no stream parado, para proxies não fecharem a conexão ociosa
+CHANGES_HEARTBEAT = float(os.getenv("CHANGES_HEARTBEAT", "15"))
+# Eventos mais antigos que isso são apagados no startup; cursores anteriores recebem reset
+CHANGES_RETENTION_DAYS = float(os.getenv("CHANGES_RETENTION_DAYS", "7"))
+CHANGES_PAGE_SIZE = 100
+
+_lock = threading.Lock()
+_listeners: set = set()
+
+
+@contextmanager
+def listen():
+    # Evento acordado por notify() enquanto o stream estiver aberto
+    wakeup = asyncio.Event()
+    listener = (asyncio.get_running_loop(), wakeup)
+    with _lock:
+        _listeners.add(listener)
+    try:
+        yield wakeup
+    finally:
+        with _lock:
+            _listeners.discard(listener)
+
+
+def notify():
+    # Chamado depois do commit de uma escrita (no threadpool ou no loop): acorda os streams deste worker
+    with _lock:
+        listeners = list(_listeners)
+    for loop, wakeup in listeners:
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            # Loop já encerrado (worker desligando)
+            pass
+
+
+def prune():
+    # Apaga os eventos fora da retenção (roda no startup do worker)
+    from database import SessionLocal
+    import crud
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=CHANGES_RETENTION_DAYS)
+    with SessionLocal() as db:
+        deleted = crud.prune_changes(db, cutoff)
+    if deleted:
+        logger.info("Feed de alterações: %d eventos anteriores a %s apagados", deleted, cutoff.date())
@@ -0,0 +1,54 @@
+from typing import Any, Optional
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from database import pinned_to_primary
+import cache
+import metrics
+import http_cache
+
+class DefaultResponse(ORJSONResponse):
+    # Resposta padrão da API: orjson no lugar do json da stdlib, com o tempo entrando nas métricas
+    def render(self, content: Any) -> bytes:
+        with metrics.serialization():
+            return super().render(content)
+
+_adapters: dict[Any, TypeAdapter] = {}
+
+
+def _adapter(model_type) -> TypeAdapter:
+    # Um TypeAdapter por tipo: o serializer do Pydantic é montado uma vez só
+    adapter = _adapters.get(model_type)
+    if adapter is None:
+        adapter = _adapters[model_type] = TypeAdapter(model_type)
+    return adapter
+
+
+def _dump(model_type, value) -> bytes:
+    adapter = _adapter(model_type)
+    with metrics.serialization():
+        if not (isinstance(model_type, type) and isinstance(value, model_type)):
+            value = adapter.validate_python(value, from_attributes=True)
+        return adapter.dump_json(value)
+
+
+def json_response(body: bytes, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    # JSON já serializado; os cabeçalhos definidos na resposta da rota (ETag, Cache-Control...) vão junto
+    headers = dict(response.headers) if response is not None else None
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def model_payload(model_type, value, etag: str, last_modified=None) -> cache.Payload:
+    # Resposta já serializada, pronta para guardar no cache
+    return cache.Payload(_dump(model_type, value), etag, last_modified)
+
+
+async def cached_payload(request: Request, key: str, loader, tags) -> cache.Payload:
+    # Leituras autenticadas (admin) sempre vão ao banco, e aproveitam para atualizar o cache
+    return await cache.get_or_load(key, loader, tags, refresh=pinned_to_primary(request))
+
+
+def payload_response(request: Request, response: Response, payload: cache.Payload) -> Response:
+    # 304 quando o cliente já tem essa versão; senão o JSON guardado, com ETag/Last-Modified
+    not_modified = http_cache.conditional(request, response, payload.etag, payload.last_modified)
+    return not_modified or json_response(payload.body, response)
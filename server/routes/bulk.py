@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from database import DbSession, get_db, read_session, run_db
+import crud
+import json
+import orjson
+
+router = APIRouter()
+
+# Limite de erros devolvidos no resumo (a contagem continua completa)
+MAX_REPORTED_ERRORS = 1000
+
+
+def _resource_or_404(resource: str):
+    if resource not in crud.BULK_IMPORTERS:
+        raise HTTPException(status_code=404, detail="Recurso inválido. Use posts, categories ou tags.")
+
+
+async def _ndjson_lines(request: Request):
+    # Lê o corpo em streaming, linha a linha, sem carregar o arquivo inteiro na memória
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, line
+    if buffer:
+        yield line_number + 1, buffer
+
+
+@router.post("/bulk/{resource}")
+async def bulk_import(resource: str, request: Request, db: DbSession = Depends(get_db)):
+    _resource_or_404(resource)
+    schema, _ = crud.BULK_IMPORTERS[resource]
+
+    inserted = 0
+    failed = 0
+    errors = []
+    chunk = []
+
+    def report(new_errors):
+        nonlocal failed
+        failed += len(new_errors)
+        errors.extend(new_errors[:MAX_REPORTED_ERRORS - len(errors)])
+
+    async def flush():
+        nonlocal inserted, chunk
+        if chunk:
+            count, chunk_errors = await run_db(db, crud.bulk_import, resource, chunk)
+            inserted += count
+            report(chunk_errors)
+            chunk = []
+
+    async for line_number, line in _ndjson_lines(request):
+        if not line.strip():
+            continue
+        try:
+            chunk.append((line_number, schema.model_validate(json.loads(line))))
+        except (ValueError, ValidationError) as error:
+            report([{"line": line_number, "error": str(error).splitlines()[0]}])
+            continue
+        if len(chunk) >= crud.BULK_CHUNK_SIZE:
+            await flush()
+    await flush()
+
+    return {"inserted": inserted, "failed": failed, "errors": errors}
+
+
+@router.get("/bulk/{resource}")
+async def bulk_export(resource: str):
+    _resource_or_404(resource)
+    exporter = crud.BULK_EXPORTERS[resource]
+
+    async def stream():
+        # Sessão própria: o corpo é gerado depois que a rota já retornou
+        async with read_session() as db:
+            after = 0
+            while True:
+                rows = await run_db(db, exporter, after)
+                if not rows:
+                    break
+                yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+                after = rows[-1]["id"]
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -1,48 +1,85 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from schemas import CategoryCreate, CategoryUpdate, CategoryResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Request, Response
+from database import DbSession, ReadSession, get_db, get_read_db, run_db
+from schemas import CategoryCreate, CategoryUpdate, CategoryResponse, CategorySummary
+from typing import List
+from responses import cached_payload, model_payload, payload_response
 import crud
-import os
+import http_cache
+import images
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/categories", response_model=list[CategoryResponse])
-def get_categories_tree(db: Session = Depends(get_db)):
-    return crud.get_categories_tree(db)
+async def get_categories_tree(request: Request, response: Response, db: ReadSession = Depends(get_read_db)):
+    # Devolve o JSON já pronto do cache, sem passar pela serialização do FastAPI
+    async def load():
+        stamp = await run_db(db, crud.get_versions, "categories")
+        tree = await run_db(db, crud.get_categories_tree)
+        etag = http_cache.make_etag("categories", stamp.version)
+        return model_payload(List[CategoryResponse], tree, etag, stamp.updated_at)
+
+    payload = await cached_payload(request, "categories:tree", load, ("categories",))
+    return payload_response(request, response, payload)
+
+@router.get("/categories/{category_id}/breadcrumbs", response_model=List[CategorySummary])
+async def get_category_breadcrumbs(category_id: int, request: Request, response: Response, db: ReadSession = Depends(get_read_db)):
+    stamp = await run_db(db, crud.get_versions, "categories")
+    not_modified = http_cache.conditional(
+        request, response, http_cache.make_etag("breadcrumbs", category_id, stamp.version), stamp.updated_at
+    )
+    if not_modified:
+        return not_modified
+
+    # Da raiz até a categoria pedida
+    breadcrumbs = await run_db(db, crud.get_category_breadcrumbs, category_id)
+    if not breadcrumbs:
+        raise HTTPException(status_code=404, detail="Categoria não encontrada")
+    return breadcrumbs
 
 @router.post("/categories", response_model=CategoryResponse)
 async def create_category(
+    background_tasks: BackgroundTasks,
     name: str = Form(...),
     parent_id: str = Form(""),
-    image: str = Form(...),
-    db: Session = Depends(get_db)
+    image: UploadFile = File(...),
+    db: DbSession = Depends(get_db)
 ):
     parent_id_int = int(parent_id) if parent_id.strip() != "" else None
 
-    image_url = f"/img/{image}"
+    # O original é gravado agora; as variantes redimensionadas são geradas depois da resposta
+    image_url = await images.save_upload(image)
 
     category_data = CategoryCreate(name=name, parent_id=parent_id_int, image_url=image_url)
-    new_category = crud.create_category(db, category_data, image_url)
+    new_category = await run_db(db, crud.create_category, category_data, image_url)
+    background_tasks.add_task(images.process_category_image, new_category.id, image_url)
     return new_category
 
+@router.put("/categories/{category_id}/image", response_model=CategoryResponse)
+async def update_category_image(
+    category_id: int,
+    background_tasks: BackgroundTasks,
+    image: UploadFile = File(...),
+    db: DbSession = Depends(get_db)
+):
+    image_url = await images.save_upload(image)
+    category = await run_db(db, crud.set_category_image, category_id, image_url)
+    if not category:
+        raise HTTPException(status_code=404, detail="Categoria não encontrada")
+    background_tasks.add_task(images.process_category_image, category_id, image_url)
+    return category
+
 @router.put("/categories/{category_id}")
-def update_category(category_id: int, category_data: CategoryUpdate, db: Session = Depends(get_db)):
-    category = crud.update_category(db, category_id, category_data)
+async def update_category(category_id: int, category_data: CategoryUpdate, db: DbSession = Depends(get_db)):
+    category = await run_db(db, crud.update_category, category_id, category_data)
     if not category:
         raise HTTPException(status_code=404, detail="Categoria não encontrado")
     return category
 
 @router.delete("/categories/{category_id}")
-def delete_category(category_id: int, db: Session = Depends(get_db)):
-    category = crud.delete_category(db, category_id)
+async def delete_category(category_id: int, db: DbSession = Depends(get_db)):
+    category = await run_db(db, crud.delete_category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Categoria não encontrada")
+    if isinstance(category, str):
+        raise HTTPException(status_code=400, detail=category)
     return {"message": "Categoria excluída com sucesso"}
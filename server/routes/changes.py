@@ -0,0 +1,96 @@
+import asyncio
+import time
+from typing import Optional
+import orjson
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from database import DbSession, get_db, read_session, run_db
+from schemas import ChangeFeed
+import outbox
+import crud
+import http_cache
+
+router = APIRouter()
+
+# O feed não pode ficar velho no CDN: sempre revalida (o 304 continua valendo)
+FEED_CACHE_CONTROL = "no-cache"
+# Espera sugerida ao navegador antes de reconectar o EventSource
+SSE_RETRY_MS = 3000
+
+
+def _cursor(request: Request, since: Optional[int]) -> Optional[int]:
+    # ?since= tem prioridade; na reconexão o EventSource manda o último id recebido em Last-Event-ID
+    if since is not None:
+        return since
+    last_event_id = request.headers.get("last-event-id", "").strip()
+    return int(last_event_id) if last_event_id.isdigit() else None
+
+
+@router.get("/changes", response_model=ChangeFeed)
+async def get_changes(
+    request: Request,
+    response: Response,
+    since: Optional[int] = Query(None, description="Id do último evento recebido; sem ele, só devolve a posição atual"),
+    limit: int = Query(outbox.CHANGES_PAGE_SIZE, ge=1, le=1000),
+    db: DbSession = Depends(get_db)
+):
+    # Sempre no primário: réplicas em pontos diferentes do log fariam o cursor de um cliente
+    # passar do maior id de outra e o feed responderia reset sem motivo
+    cursor = _cursor(request, since)
+    stamp = await run_db(db, crud.get_versions, "changes")
+    not_modified = http_cache.conditional(
+        request, response, http_cache.make_etag("changes", stamp.version, cursor, limit), stamp.updated_at
+    )
+    if not_modified:
+        not_modified.headers["Cache-Control"] = FEED_CACHE_CONTROL
+        return not_modified
+    response.headers["Cache-Control"] = FEED_CACHE_CONTROL
+    return await run_db(db, crud.get_change_feed, cursor, limit)
+
+
+def _sse(event: str, data: bytes, event_id: Optional[int] = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: ".encode() + data + b"\n\n"
+
+
+async def _event_stream(cursor: Optional[int]):
+    yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+    with outbox.listen() as wakeup:
+        last_write = time.monotonic()
+        while True:
+            wakeup.clear()
+            # Uma sessão curta por consulta: o stream não segura conexão do pool enquanto espera.
+            # No primário, como em GET /changes
+            async with read_session(primary=True) as db:
+                feed = await run_db(db, crud.get_change_feed, cursor, outbox.CHANGES_PAGE_SIZE)
+            if feed.reset:
+                yield _sse("reset", b"{}")
+            for event in feed.events:
+                # O nome do evento é o recurso (posts, categories, tags): addEventListener("posts", ...)
+                yield _sse(event.resource, orjson.dumps(event.model_dump(mode="json")), event.id)
+            if feed.events or feed.reset:
+                last_write = time.monotonic()
+            cursor = feed.last_id
+            if len(feed.events) == outbox.CHANGES_PAGE_SIZE:
+                continue
+
+            if time.monotonic() - last_write >= outbox.CHANGES_HEARTBEAT:
+                yield b": keepalive\n\n"
+                last_write = time.monotonic()
+            try:
+                await asyncio.wait_for(wakeup.wait(), outbox.CHANGES_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+@router.get("/changes/stream")
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, description="Id do último evento recebido; sem ele, só os eventos novos")
+):
+    # Server-Sent Events: cada evento leva o id, então a reconexão continua de onde parou
+    return StreamingResponse(
+        _event_stream(_cursor(request, since)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, Query, Request, Response
+from database import ReadSession, get_read_db, run_db
+from schemas import Facets
+from responses import cached_payload, model_payload, payload_response
+import crud
+import http_cache
+
+router = APIRouter()
+
+FACET_TAGS = ("posts", "categories", "tags")
+
+@router.get("/facets", response_model=Facets)
+async def get_facets(
+    request: Request,
+    response: Response,
+    rollup: bool = Query(False, description="Soma também os posts das subcategorias em subtree_count"),
+    db: ReadSession = Depends(get_read_db)
+):
+    # Os agregados só mudam com escritas em posts, categorias ou tags
+    async def load():
+        stamp = await run_db(db, crud.get_versions, *FACET_TAGS)
+        facets = await run_db(db, crud.get_facets, rollup)
+        etag = http_cache.make_etag("facets", int(rollup), stamp.version)
+        return model_payload(Facets, facets, etag, stamp.updated_at)
+
+    payload = await cached_payload(request, f"facets:{int(rollup)}", load, FACET_TAGS)
+    return payload_response(request, response, payload)
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+import http_cache
+import images
+
+router = APIRouter()
+
+@router.get("/images/{name}")
+async def get_image(name: str, request: Request):
+    # O nome é o hash do conteúdo: o arquivo pode ficar em cache para sempre (e no CDN)
+    found = images.file_path(name)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Imagem não encontrada")
+    path, media_type, etag = found
+
+    headers = {"ETag": etag, "Cache-Control": images.IMMUTABLE_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and http_cache.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    # FileResponse atende Range/If-Range (download parcial e retomada)
+    return FileResponse(path, media_type=media_type, headers=headers)
@@ -1,73 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from typing import List, Optional
-from database import SessionLocal
-from schemas import PostCreate, PostUpdate
+from database import DbSession, ReadSession, get_db, get_read_db, run_db
+from schemas import PostCreate, PostUpdate, PostPage, PostDetail
+from responses import cached_payload, model_payload, payload_response
 import crud
+import http_cache
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Tags do cache (e versões) das quais as listagens dependem
+POST_LIST_TAGS = ("posts", "categories", "tags")
 
-@router.get("/posts")
-def get_posts(
+@router.get("/posts", response_model=PostPage)
+async def get_posts(
+    request: Request,
+    response: Response,
     search: Optional[str] = Query(None, description="Termo de busca para filtrar posts por título ou conteúdo"),
     categories: Optional[List[int]] = Query(None, description="Lista de IDs de categorias para filtrar posts"),
-    db: Session = Depends(get_db)
+    include_descendants: bool = Query(False, description="Inclui os posts das subcategorias, em qualquer nível"),
+    tags: Optional[List[int]] = Query(None, description="Lista de IDs de opções de tag para filtrar posts"),
+    tag_mode: str = Query("any", pattern="^(any|all)$", description="any: qualquer uma das tags; all: todas as tags"),
+    limit: int = Query(crud.POSTS_PAGE_SIZE, ge=1, le=100, description="Quantidade máxima de posts na página"),
+    after: Optional[int] = Query(None, ge=0, description="Cursor: next_cursor da página anterior"),
+    db: ReadSession = Depends(get_read_db)
 ):
-    if categories:
-        # Filtra posts por categorias
-        posts = crud.get_posts_by_categories(db, categories)
-    else:
-        # Filtra posts por termo de busca
-        posts = crud.get_posts(db, search)
-    
-    if not posts:
-        raise HTTPException(status_code=404, detail="Nenhum post encontrado")
-    
-    return posts
+    # A busca também olha o nome das categorias e os itens trazem categoria e opções de tag
+    async def load():
+        stamp = await run_db(db, crud.get_versions, *POST_LIST_TAGS)
+        page = await run_db(db, crud.get_posts, search, limit, after, categories, include_descendants, tags, tag_mode)
+        etag = http_cache.make_etag("posts", stamp.version, request.url.query)
+        return model_payload(PostPage, page, etag, stamp.updated_at)
 
-@router.get("/posts/{post_id}")
-def get_post_by_id(post_id: int, db: Session = Depends(get_db)):
-    post = crud.get_post_by_id(db, post_id)
-    if not post:
-        raise HTTPException(status_code=404, detail="Post não encontrado")
-    return post
+    # Filtra posts por categorias, opções de tag e termo de busca (combináveis)
+    payload = await cached_payload(request, f"posts?{request.url.query}", load, POST_LIST_TAGS)
+    return payload_response(request, response, payload)
 
-@router.get("/posts/by-categories")
-def get_posts_by_categories(
+@router.get("/posts/by-categories", response_model=PostPage)
+async def get_posts_by_categories(
+    request: Request,
+    response: Response,
     category_ids: List[int] = Query(..., description="Lista de IDs de categorias para buscar os posts"),
-    db: Session = Depends(get_db)
+    include_descendants: bool = Query(False, description="Inclui os posts das subcategorias, em qualquer nível"),
+    limit: int = Query(crud.POSTS_PAGE_SIZE, ge=1, le=100, description="Quantidade máxima de posts na página"),
+    after: Optional[int] = Query(None, ge=0, description="Cursor: next_cursor da página anterior"),
+    db: ReadSession = Depends(get_read_db)
 ):
-    print(f"Categorias recebidas: {category_ids}")
-    
+    # Os itens trazem categoria e opções de tag; com include_descendants depende também da árvore
+    async def load():
+        stamp = await run_db(db, crud.get_versions, *POST_LIST_TAGS)
+        page = await run_db(db, crud.get_posts_by_categories, category_ids, limit, after, include_descendants)
+        etag = http_cache.make_etag("posts/by-categories", stamp.version, request.url.query)
+        return model_payload(PostPage, page, etag, stamp.updated_at)
+
     # Chama a função que busca os posts das categorias
-    posts = crud.get_posts_by_categories(db, category_ids)
-    
-    if not posts:
-        raise HTTPException(status_code=404, detail="Nenhum post encontrado para essas categorias")
+    payload = await cached_payload(request, f"posts/by-categories?{request.url.query}", load, POST_LIST_TAGS)
+    return payload_response(request, response, payload)
+
+@router.get("/posts/{post_id}", response_model=PostDetail)
+async def get_post_by_id(
+    post_id: int,
+    request: Request,
+    response: Response,
+    content_format: str = Query("lexical", alias="format", pattern="^(lexical|html|text)$",
+                                description="Formato do conteúdo: JSON do Lexical, HTML sanitizado ou texto puro"),
+    db: ReadSession = Depends(get_read_db)
+):
+    # O post traz a categoria e as opções de tag, então depende também dessas versões
+    async def load():
+        stamp = await run_db(db, crud.get_versions, "posts", "categories", "tags")
+        post = await run_db(db, crud.get_post_by_id, post_id, content_format)
+        if not post:
+            raise HTTPException(status_code=404, detail="Post não encontrado")
+        etag = http_cache.make_etag("post", post_id, content_format, stamp.version)
+        return model_payload(PostDetail, post, etag, stamp.updated_at)
 
-    return posts
+    payload = await cached_payload(
+        request, f"post:{post_id}:{content_format}", load, (f"post:{post_id}", "categories", "tags")
+    )
+    return payload_response(request, response, payload)
 
-@router.post("/posts")
-def post_create(post_data: PostCreate, db: Session = Depends(get_db)):
-    return crud.create_post(db, post_data)
+@router.post("/posts", response_model=PostDetail)
+async def post_create(post_data: PostCreate, db: DbSession = Depends(get_db)):
+    return await run_db(db, crud.create_post, post_data)
 
-@router.put("/posts/{post_id}")
-def update_post(post_id: int, post_data: PostUpdate, db: Session = Depends(get_db)):
-    post = crud.update_post(db, post_id, post_data)
+@router.put("/posts/{post_id}", response_model=PostDetail)
+async def update_post(post_id: int, post_data: PostUpdate, db: DbSession = Depends(get_db)):
+    post = await run_db(db, crud.update_post, post_id, post_data)
     if not post:
         raise HTTPException(status_code=404, detail="Post não encontrado")
     return post
 
 @router.delete("/posts/{post_id}")
-def delete_post(post_id: int, db: Session = Depends(get_db)):
-    post = crud.delete_post(db, post_id)
+async def delete_post(post_id: int, db: DbSession = Depends(get_db)):
+    post = await run_db(db, crud.delete_post, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post não encontrado")
     return {"message": "Post excluído com sucesso"}
\ No newline at end of file
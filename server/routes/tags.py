@@ -1,32 +1,38 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from schemas import TagCreate, TagUpdate, TagResponse
+from fastapi import APIRouter, Depends, Request, Response
+from typing import List
+from database import DbSession, ReadSession, get_db, get_read_db, run_db
+from schemas import TagCreate, TagUpdate, TagBatchUpdate, TagResponse
+from responses import cached_payload, model_payload, payload_response
 import crud
+import http_cache
 
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/tags", response_model=list[TagResponse])
-def get_tags(db: Session = Depends(get_db)):
-    return crud.get_tags(db)
+async def get_tags(request: Request, response: Response, db: ReadSession = Depends(get_read_db)):
+    async def load():
+        stamp = await run_db(db, crud.get_versions, "tags")
+        tags = await run_db(db, crud.get_tags)
+        return model_payload(List[TagResponse], tags, http_cache.make_etag("tags", stamp.version), stamp.updated_at)
+
+    payload = await cached_payload(request, "tags", load, ("tags",))
+    return payload_response(request, response, payload)
 
 @router.post("/tags", response_model=TagResponse)
-def create_tag(tag: TagCreate, db: Session = Depends(get_db)):
-    return crud.create_tag(db, tag)
+async def create_tag(tag: TagCreate, db: DbSession = Depends(get_db)):
+    return await run_db(db, crud.create_tag, tag)
+
+@router.put("/tags", response_model=List[TagResponse])
+async def update_tags(tags: List[TagBatchUpdate], db: DbSession = Depends(get_db)):
+    # Edita várias tags de uma vez, em uma única transação
+    return await run_db(db, crud.update_tags, tags)
 
 @router.put("/tags/{tag_id}", response_model=TagResponse)
-def update_tag(tag_id: int, tag: TagUpdate, db: Session = Depends(get_db)):
-    return crud.update_tag(db, tag_id, tag)
+async def update_tag(tag_id: int, tag: TagUpdate, db: DbSession = Depends(get_db)):
+    return await run_db(db, crud.update_tag, tag_id, tag)
 
 
 @router.delete("/tags/{tag_id}")
-def delete_tag(tag_id: int, db: Session = Depends(get_db)):
-    return crud.delete_tag(db, tag_id)
+async def delete_tag(tag_id: int, db: DbSession = Depends(get_db)):
+    return await run_db(db, crud.delete_tag, tag_id)
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Union
+from datetime import datetime
 import json
 
 # Models para Category
@@ -7,6 +8,9 @@ class CategoryBase(BaseModel):
     name: str
     parent_id: Optional[int] = None
     image_url: Optional[str] = None
+    # srcset das variantes em JPEG e WebP (vazios até o processamento da imagem terminar)
+    image_srcset: Optional[str] = None
+    image_webp_srcset: Optional[str] = None
 
 class CategoryCreate(CategoryBase):
     pass
@@ -44,8 +48,16 @@ class TagResponse(TagBase):
 class TagCreate(TagBase):
     options: List[str] = []
 
+# Opção enviada na edição: só o nome (nova ou mantida pelo nome) ou com o id (mantida/renomeada)
+class TagOptionUpdate(BaseModel):
+    id: Optional[int] = None
+    name: str
+
 class TagUpdate(TagBase):
-    options: List[str] = []
+    options: List[Union[TagOptionUpdate, str]] = []
+
+class TagBatchUpdate(TagUpdate):
+    id: int
 
 # Models para Post
 class PostBase(BaseModel):
@@ -62,6 +74,8 @@ class PostCreate(PostBase):
 class PostUpdate(PostBase):
     content: str
     tag_option_ids: List[int] = []
+    # Versão que o editor carregou; se o post mudou desde então a edição é recusada (409)
+    version: Optional[int] = None
 
 
 class PostResponse(PostBase):
@@ -78,4 +92,106 @@ class PostResponse(PostBase):
         return self.content
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class PostTagOption(TagOptionResponse):
+    tag_type_id: int
+
+
+# Categoria sem a árvore de subcategorias (embutida nos posts e nos breadcrumbs)
+class CategorySummary(CategoryBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+
+class PostDetail(PostBase):
+    id: int
+    excerpt: Optional[str] = None
+    # "lexical" (JSON do editor), "html" ou "text"
+    format: str = "lexical"
+    content: str
+    category: Optional[CategorySummary] = None
+    tag_options: List[PostTagOption] = []
+    version: int = 1
+
+
+class PostListItem(PostBase):
+    id: int
+    excerpt: Optional[str] = None
+    category: Optional[CategorySummary] = None
+    tag_options: List[PostTagOption] = []
+
+    class Config:
+        from_attributes = True
+
+
+class PostPage(BaseModel):
+    items: List[PostListItem] = []
+    # Cursor opaco: enviar em "after" para buscar a próxima página (None quando acabou)
+    next_cursor: Optional[int] = None
+
+
+# Contagem de posts por categoria e por opção de tag (navegação por facetas)
+class CategoryFacet(BaseModel):
+    id: int
+    name: str
+    parent_id: Optional[int] = None
+    count: int
+    # Posts da categoria e de todas as subcategorias (só com rollup=true)
+    subtree_count: Optional[int] = None
+
+
+class TagOptionFacet(PostTagOption):
+    count: int
+
+
+class Facets(BaseModel):
+    categories: List[CategoryFacet] = []
+    tag_options: List[TagOptionFacet] = []
+
+
+# Models para importação/exportação em massa (uma linha NDJSON = um objeto).
+# O id é opcional: quando vem (ex.: de uma exportação), é preservado.
+class CategoryImport(CategoryBase):
+    id: Optional[int] = None
+
+
+class TagOptionImport(BaseModel):
+    id: Optional[int] = None
+    name: str
+
+
+class TagImport(TagBase):
+    id: Optional[int] = None
+    is_mandatory: bool = False
+    # Aceita só o nome da opção ou o objeto com id
+    options: List[Union[TagOptionImport, str]] = []
+
+
+class PostImport(PostBase):
+    id: Optional[int] = None
+    # JSON do Lexical, como string ou já como objeto
+    content: Union[str, dict]
+    tag_option_ids: List[int] = []
+
+
+# Models do feed de alterações
+class ChangeEventResponse(BaseModel):
+    id: int
+    resource: str
+    resource_id: Optional[int] = None
+    action: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ChangeFeed(BaseModel):
+    events: List[ChangeEventResponse] = []
+    # Cursor para a próxima chamada (?since=)
+    last_id: Optional[int] = None
+    # O cursor é mais antigo que os eventos guardados: recarregue tudo antes de seguir
+    reset: bool = False
@@ -0,0 +1,118 @@
+from sqlalchemy import func, literal_column, or_, text, inspect, select, table, column
+from sqlalchemy.orm import Session
+from models import Post, Category
+
+# Configuração de idioma do full-text do Postgres (tem que ser a mesma do índice GIN da migration)
+TS_CONFIG = literal_column("'portuguese'::regconfig")
+
+FTS_TABLE = "posts_fts"
+# No FTS5 a coluna oculta com o nome da tabela é a usada no MATCH
+_fts = table(FTS_TABLE, column("rowid"), column(FTS_TABLE))
+
+# Cache por engine: a tabela FTS5 existe nesse banco SQLite?
+_fts_available: dict = {}
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def _has_fts(db: Session) -> bool:
+    bind = db.get_bind()
+    key = str(bind.url)
+    if key not in _fts_available:
+        # Pela conexão da própria sessão: outra conexão esperaria o lock de uma escrita em andamento
+        _fts_available[key] = inspect(db.connection()).has_table(FTS_TABLE)
+    return _fts_available[key]
+
+
+def _pg_document():
+    return func.to_tsvector(
+        TS_CONFIG,
+        func.coalesce(Post.title, literal_column("''")).op("||")(literal_column("' '")).op("||")(
+            func.coalesce(Post.plain_text, literal_column("''"))
+        )
+    )
+
+
+def _fts5_query(term: str) -> str:
+    # Cada palavra vira uma frase entre aspas (escapa a sintaxe do FTS5); a última aceita prefixo
+    tokens = ['"%s"' % token.replace('"', '""') for token in term.split()]
+    if tokens:
+        tokens[-1] += "*"
+    return " ".join(tokens)
+
+
+def create_index(bind):
+    # Cria o índice de busca do SQLite (no Postgres o índice GIN vem da migration)
+    if bind.dialect.name != "sqlite":
+        return
+    with bind.begin() as conn:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')"
+        ))
+    _fts_available.pop(str(bind.url), None)
+
+
+def index_posts(db: Session, posts: list[tuple[int, str, str]]):
+    # Mantém o índice SQLite na mesma transação da escrita dos posts: [(id, título, texto)]
+    if not posts or _dialect(db) != "sqlite" or not _has_fts(db):
+        return
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), [{"id": post_id} for post_id, _, _ in posts])
+    db.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (:id, :title, :body)"),
+        [{"id": post_id, "title": title, "body": body} for post_id, title, body in posts]
+    )
+
+
+def index_post(db: Session, post_id: int, title: str, plain_text: str):
+    index_posts(db, [(post_id, title, plain_text)])
+
+
+def remove_post(db: Session, post_id: int):
+    if _dialect(db) != "sqlite" or not _has_fts(db):
+        return
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": post_id})
+
+
+def search_posts(db: Session, query, term: str):
+    """
+    Aplica a busca em uma query de posts e devolve (query, relevância). A relevância é uma
+    expressão em que menor é mais relevante (None sem índice: a ordem é só por id).
+    Casa título e texto do post pelo índice full-text, além dos posts das categorias
+    cujo nome contém o termo.
+    """
+    category_ids = [
+        category_id for (category_id,) in
+        db.query(Category.id).filter(Category.name.ilike(f"%{term}%")).all()
+    ]
+    in_category = Post.category_id.in_(category_ids)
+
+    dialect = _dialect(db)
+    if dialect == "postgresql":
+        ts_query = func.websearch_to_tsquery(TS_CONFIG, term)
+        document = _pg_document()
+        match = document.op("@@")(ts_query)
+        query = query.filter(or_(match, in_category) if category_ids else match)
+        return query, -func.ts_rank(document, ts_query)
+
+    if dialect == "sqlite" and _has_fts(db):
+        fts = (
+            select(_fts.c.rowid.label("post_id"), func.bm25(literal_column(FTS_TABLE)).label("rank"))
+            .where(_fts.c[FTS_TABLE].op("MATCH")(_fts5_query(term)))
+            .subquery()
+        )
+        if category_ids:
+            query = query.outerjoin(fts, fts.c.post_id == Post.id).filter(or_(fts.c.post_id.isnot(None), in_category))
+        else:
+            query = query.join(fts, fts.c.post_id == Post.id)
+        # bm25: quanto menor, mais relevante
+        return query, func.coalesce(fts.c.rank, 0)
+
+    # Sem índice disponível: varre título e texto puro (nunca o JSON do Lexical)
+    query = query.filter(or_(
+        Post.title.ilike(f"%{term}%"),
+        Post.plain_text.ilike(f"%{term}%"),
+        in_category
+    ))
+    return query, None
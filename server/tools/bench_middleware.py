@@ -0,0 +1,108 @@
+"""
+Mede o custo por requisição do middleware de autenticação, isolado do resto da API:
+a mesma rota trivial sem middleware, com o antigo @app.middleware("http")
+(BaseHTTPMiddleware) e com o AuthMiddleware ASGI puro.
+
+Uso (na pasta server):  python tools/bench_middleware.py [requisições]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, HTTPException, Request, status  # noqa: E402
+from auth import AuthMiddleware  # noqa: E402
+
+TOKEN = "bench-token"
+
+
+def make_app(kind: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping_get():
+        return {"ok": True}
+
+    @app.post("/ping")
+    async def ping_post():
+        return {"ok": True}
+
+    if kind == "base_http":
+        # Cópia do token_middleware antigo do main.py
+        @app.middleware("http")
+        async def token_middleware(request: Request, call_next):
+            if request.method in ("POST", "PUT", "DELETE"):
+                auth_header = request.headers.get("Authorization")
+                if not auth_header:
+                    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token não fornecido")
+                if "Bearer " in auth_header:
+                    token = auth_header.split("Bearer ")[1]
+                else:
+                    token = auth_header
+                expected_token = os.getenv("AUTH_TOKEN")
+                if token != expected_token:
+                    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token inválido")
+            return await call_next(request)
+    elif kind == "asgi":
+        app.add_middleware(AuthMiddleware, token=TOKEN)
+    return app
+
+
+async def call(app, method: str, headers: list) -> int:
+    status_code = 0
+    done = False
+
+    async def receive():
+        nonlocal done
+        if done:
+            await asyncio.sleep(3600)
+        done = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": "/ping", "raw_path": b"/ping", "query_string": b"", "root_path": "",
+        "headers": headers, "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+    await app(scope, receive, send)
+    return status_code
+
+
+async def measure(app, method: str, headers: list, requests: int) -> float:
+    for _ in range(200):  # aquecimento
+        await call(app, method, headers)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, method, headers)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def main(requests: int):
+    os.environ["AUTH_TOKEN"] = TOKEN
+    auth = [(b"authorization", f"Bearer {TOKEN}".encode())]
+    cases = [("GET", []), ("POST", auth)]
+
+    print(f"{requests} requisições por caso (µs por requisição)")
+    print(f"{'middleware':<12} {'GET':>10} {'POST':>10}")
+    baseline = {}
+    for kind in ("none", "base_http", "asgi"):
+        app = make_app(kind)
+        results = [await measure(app, method, headers, requests) for method, headers in cases]
+        if kind == "none":
+            baseline = dict(zip(("GET", "POST"), results))
+        print(f"{kind:<12} {results[0]:>10.1f} {results[1]:>10.1f}", end="")
+        if kind != "none":
+            overhead = [result - baseline[method] for result, (method, _) in zip(results, cases)]
+            print(f"   (+{overhead[0]:.1f} / +{overhead[1]:.1f})", end="")
+        print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
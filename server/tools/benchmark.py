@@ -0,0 +1,396 @@
+"""
+Benchmark reprodutível da API: popula um corpus sintético (árvore de categorias, tipos e
+opções de tag, posts com JSON do Lexical de tamanho realista) e dispara as leituras
+principais e as escritas de posts, medindo p50/p95/p99, vazão e queries por requisição.
+
+Uso (na pasta server):
+    python tools/benchmark.py                                   # SQLite temporário, ASGI em processo
+    python tools/benchmark.py --database-url postgresql://...   # Postgres local (já migrado com alembic)
+    python tools/benchmark.py --mode both                       # também contra o uvicorn
+    python tools/benchmark.py --output atual.json --baseline base.json --tolerance 0.2
+
+Com --baseline o script sai com código 1 se alguma rota ficar mais lenta que a referência
+ou fizer mais queries por requisição além da tolerância (uso em gate de release).
+O corpus é gerado a partir de --seed: a mesma linha de comando gera sempre os mesmos dados.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+TOKEN = "bench-token"
+# Opções que precisam ser iguais às da referência para a comparação valer
+COMPARABLE_CONFIG = ("seed", "posts", "categories", "depth", "tag_types", "options", "paragraphs",
+                     "requests", "writes", "concurrency", "async_db", "cold", "workers")
+
+WORDS = (
+    "python django fastapi banco dados consulta índice árvore categoria servidor cliente "
+    "cache resposta requisição latência memória processo thread evento fila mensagem "
+    "arquivo imagem busca texto editor página lista detalhe migração tabela coluna chave "
+    "transação conexão réplica pool worker função classe módulo pacote teste deploy"
+).split()
+
+
+#! ------------------------- CORPUS -------------------------
+def _text_node(rng: random.Random, words: int) -> dict:
+    return {
+        "detail": 0, "format": rng.choice((0, 0, 0, 1, 2)), "mode": "normal", "style": "",
+        "text": " ".join(rng.choice(WORDS) for _ in range(words)).capitalize(),
+        "type": "text", "version": 1,
+    }
+
+
+def _block(node_type: str, children: list, **extra) -> dict:
+    return {"children": children, "direction": "ltr", "format": "", "indent": 0,
+            "type": node_type, "version": 1, **extra}
+
+
+def lexical_content(rng: random.Random, paragraphs: int) -> dict:
+    # Estrutura igual à que o editor do cliente salva: títulos, parágrafos com trechos formatados e listas
+    children = [_block("heading", [_text_node(rng, rng.randint(3, 8))], tag="h2")]
+    for index in range(max(1, int(rng.gauss(paragraphs, paragraphs / 3)))):
+        if index % 5 == 4:
+            items = [_block("listitem", [_text_node(rng, rng.randint(4, 12))], value=item + 1)
+                     for item in range(rng.randint(2, 5))]
+            children.append(_block("list", items, listType="bullet", start=1, tag="ul"))
+        else:
+            children.append(_block("paragraph", [_text_node(rng, rng.randint(10, 40))
+                                                 for _ in range(rng.randint(1, 4))]))
+    return {"root": _block("root", children)}
+
+
+def seed_corpus(args) -> dict:
+    """
+    Popula o banco pelo bulk_import do crud (mesmo caminho do /bulk: closure table,
+    índice de busca e versões ficam consistentes). Devolve os ids usados pelos cenários.
+    """
+    from database import Base, SessionLocal, get_engine
+    from schemas import CategoryImport, TagImport, TagOptionImport, PostImport
+    import crud
+    import search
+
+    # Banco de benchmark descartável: o schema sai direto dos modelos (num Postgres já migrado não muda nada)
+    engine = get_engine()
+    Base.metadata.create_all(bind=engine)
+    search.create_index(engine)
+
+    rng = random.Random(args.seed)
+    db = SessionLocal()
+    try:
+        # Categorias nível a nível: o import valida o pai no banco antes de inserir o lote
+        levels, depths = [[]], {}
+        for category_id in range(1, args.categories + 1):
+            candidates = [cid for cid, depth in depths.items() if depth < args.depth - 1]
+            parent_id = rng.choice(candidates) if candidates and rng.random() < 0.7 else None
+            depths[category_id] = depths[parent_id] + 1 if parent_id else 0
+            while len(levels) <= depths[category_id]:
+                levels.append([])
+            levels[depths[category_id]].append(
+                CategoryImport(id=category_id, name=f"Categoria {category_id}", parent_id=parent_id)
+            )
+        for level in levels:
+            _import(crud, db, "categories", level)
+
+        option_ids, tags = [], []
+        for tag_id in range(1, args.tag_types + 1):
+            options = []
+            for index in range(args.options):
+                option_ids.append(len(option_ids) + 1)
+                options.append(TagOptionImport(id=option_ids[-1], name=f"Opção {tag_id}.{index + 1}"))
+            tags.append(TagImport(id=tag_id, name=f"Tipo {tag_id}", options=options))
+        _import(crud, db, "tags", tags)
+
+        category_ids = list(depths)
+        for start in range(0, args.posts, 500):
+            _import(crud, db, "posts", [
+                PostImport(
+                    id=post_id,
+                    title=" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))).capitalize(),
+                    content=lexical_content(rng, args.paragraphs),
+                    category_id=rng.choice(category_ids),
+                    tag_option_ids=rng.sample(option_ids, min(len(option_ids), rng.randint(1, 3))),
+                )
+                for post_id in range(start + 1, min(start + 500, args.posts) + 1)
+            ])
+    finally:
+        db.close()
+
+    return {"post_ids": list(range(1, args.posts + 1)), "category_ids": category_ids, "option_ids": option_ids}
+
+
+def _import(crud, db, resource: str, rows: list):
+    inserted, errors = crud.bulk_import(db, resource, list(enumerate(rows, start=1)))
+    if errors:
+        raise SystemExit(f"Falha ao popular {resource} (o banco precisa estar vazio): {errors[:3]}")
+
+
+def load_corpus() -> dict:
+    # --skip-seed: reaproveita o que já está no banco
+    from database import SessionLocal, get_engine
+    from models import Category, Post, TagOption
+
+    get_engine()
+    db = SessionLocal()
+    try:
+        return {
+            "post_ids": [pid for (pid,) in db.query(Post.id).all()],
+            "category_ids": [cid for (cid,) in db.query(Category.id).all()],
+            "option_ids": [oid for (oid,) in db.query(TagOption.id).all()],
+        }
+    finally:
+        db.close()
+
+
+#! ------------------------- CENÁRIOS -------------------------
+def build_scenarios(corpus: dict, rng: random.Random) -> list:
+    """
+    Cada cenário é (nome, função que gera a i-ésima requisição).
+    As escritas vêm por último e em sequência: criar -> editar -> excluir os posts criados.
+    """
+    post_ids, category_ids, option_ids = corpus["post_ids"], corpus["category_ids"], corpus["option_ids"]
+    created: list[int] = []
+
+    def new_post(index: int) -> dict:
+        return {
+            "title": f"Benchmark {index} {rng.choice(WORDS)}",
+            "content": json.dumps(lexical_content(rng, 8)),
+            "category_id": rng.choice(category_ids),
+            "tag_option_ids": rng.sample(option_ids, min(len(option_ids), 2)),
+        }
+
+    return [
+        ("GET /posts", lambda i: ("GET", "/posts", {"params": {"limit": 20, "after": rng.choice(post_ids) + 1}})),
+        ("GET /posts?search", lambda i: ("GET", "/posts", {"params": {"search": rng.choice(WORDS), "limit": 20}})),
+        ("GET /posts?categories", lambda i: ("GET", "/posts", {"params": {
+            "categories": rng.choice(category_ids), "include_descendants": "true", "limit": 20}})),
+        ("GET /posts/{id}", lambda i: ("GET", f"/posts/{rng.choice(post_ids)}", {})),
+        ("GET /categories", lambda i: ("GET", "/categories", {})),
+        ("GET /tags", lambda i: ("GET", "/tags", {})),
+        ("POST /posts", lambda i: ("POST", "/posts", {"json": new_post(i)}), created),
+        ("PUT /posts/{id}", lambda i: ("PUT", f"/posts/{created[i % len(created)]}", {"json": new_post(i)})),
+        ("DELETE /posts/{id}", lambda i: ("DELETE", f"/posts/{created.pop()}", {})),
+    ]
+
+
+def percentile(values: list, fraction: float) -> float:
+    # Nearest-rank: o valor abaixo do qual está a fração pedida das amostras
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+async def run_scenario(client, scenario: tuple, total: int, concurrency: int, count_engines: list) -> dict:
+    from database import count_queries
+
+    make_request = scenario[1]
+    created = scenario[2] if len(scenario) > 2 else None
+    # Leituras autenticadas vão sempre ao primário sem cache: o token só vai nas escritas, como no cliente
+    headers = {"Accept-Encoding": "gzip"}
+    write_headers = {**headers, "Authorization": f"Bearer {TOKEN}"}
+    latencies, errors = [], 0
+    queue = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for index in queue:
+            method, path, options = make_request(index)
+            start = time.perf_counter()
+            response = await client.request(method, path, headers=write_headers if method != "GET" else headers, **options)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+            elif created is not None:
+                created.append(response.json()["id"])
+
+    # Conta as queries de todos os engines do processo (só no modo ASGI: o uvicorn roda em outro)
+    with ExitStack() as stack:
+        counters = [stack.enter_context(count_queries(bind)) for bind in count_engines]
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(ms, 0.50), 3),
+        "p95_ms": round(percentile(ms, 0.95), 3),
+        "p99_ms": round(percentile(ms, 0.99), 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "queries_per_request": round(sum(c["count"] for c in counters) / len(latencies), 2) if counters else None,
+    }
+
+
+async def run_suite(client, corpus: dict, args, count_engines: list) -> dict:
+    rng = random.Random(args.seed)
+    results = {}
+    for scenario in build_scenarios(corpus, rng):
+        name = scenario[0]
+        is_write = name.split()[0] != "GET"
+        if not is_write and args.warmup:
+            # Aquecimento (conexões, caches, detecção do FTS) fora da medição
+            await run_scenario(client, scenario, args.warmup, args.concurrency, [])
+        total = args.writes if is_write else args.requests
+        results[name] = await run_scenario(client, scenario, total, args.concurrency, count_engines)
+        print(_format_row(name, results[name]), flush=True)
+    return results
+
+
+#! ------------------------- MODOS -------------------------
+async def run_asgi(corpus: dict, args) -> dict:
+    import httpx
+    import database
+    from main import app
+
+    count_engines = [database.get_engine()] + ([database.async_engine] if database.async_engine is not None else [])
+    # O ASGITransport não dispara o lifespan: roda aqui, como o uvicorn faria
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await run_suite(client, corpus, args, count_engines)
+
+
+async def run_uvicorn(corpus: dict, args) -> dict:
+    import httpx
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+               "--workers", str(args.workers), "--log-level", "warning"]
+    server = subprocess.Popen(command, cwd=SERVER_DIR, env=os.environ.copy())
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                if server.poll() is not None:
+                    raise SystemExit(f"O uvicorn terminou com código {server.returncode} (está instalado?)")
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise SystemExit("O uvicorn não respondeu em 30s")
+                await asyncio.sleep(0.2)
+            return await run_suite(client, corpus, args, [])
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+#! ------------------------- RELATÓRIO -------------------------
+def _format_row(name: str, result: dict) -> str:
+    queries = "-" if result["queries_per_request"] is None else f"{result['queries_per_request']:.2f}"
+    return (f"  {name:<24} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+            f"p99 {result['p99_ms']:>8.2f}ms  {result['rps']:>8.1f} req/s  queries/req {queries:>5}"
+            + (f"  ERROS {result['errors']}" if result["errors"] else ""))
+
+
+def compare(current: dict, baseline: dict, metric: str, tolerance: float) -> list:
+    """
+    Compara com um resultado salvo por --output. Regressão: a métrica (ex.: p95) ou as queries
+    por requisição acima da referência * (1 + tolerância), ou erros que não existiam.
+    (Com o cache ligado as queries por requisição variam um pouco com a taxa de acerto.)
+    """
+    regressions = []
+    for mode, scenarios in current["results"].items():
+        for name, result in scenarios.items():
+            reference = baseline.get("results", {}).get(mode, {}).get(name)
+            if reference is None:
+                continue
+            if result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{mode} {name}: {metric} {result[metric]}ms (referência {reference[metric]}ms)")
+            if (result["queries_per_request"] is not None and reference.get("queries_per_request") is not None
+                    and result["queries_per_request"] > reference["queries_per_request"] * (1 + tolerance) + 0.05):
+                regressions.append(f"{mode} {name}: {result['queries_per_request']} queries/req "
+                                   f"(referência {reference['queries_per_request']})")
+            if result["errors"] > reference.get("errors", 0):
+                regressions.append(f"{mode} {name}: {result['errors']} erros")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Banco vazio a popular (padrão: SQLite temporário)")
+    parser.add_argument("--skip-seed", action="store_true", help="Usa os dados que já estão no banco")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--categories", type=int, default=60)
+    parser.add_argument("--depth", type=int, default=4, help="Profundidade máxima da árvore de categorias")
+    parser.add_argument("--tag-types", type=int, default=4)
+    parser.add_argument("--options", type=int, default=6, help="Opções por tipo de tag")
+    parser.add_argument("--paragraphs", type=int, default=12, help="Parágrafos por post, em média (~8KB de JSON)")
+    parser.add_argument("--mode", choices=("asgi", "uvicorn", "both"), default="asgi")
+    parser.add_argument("--requests", type=int, default=500, help="Requisições medidas por cenário de leitura")
+    parser.add_argument("--writes", type=int, default=100, help="Requisições medidas por cenário de escrita")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--async-db", action="store_true", help="Roda com DB_ASYNC=true")
+    parser.add_argument("--cold", action="store_true", help="Desliga o cache de leitura (CACHE_TTL=0; a coalescência continua)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="Workers do uvicorn")
+    parser.add_argument("--output", help="Salva o resultado em JSON (serve de --baseline depois)")
+    parser.add_argument("--baseline", help="Resultado JSON de referência para detectar regressões")
+    parser.add_argument("--metric", choices=("p50_ms", "p95_ms", "p99_ms"), default="p95_ms")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Piora aceita sobre a referência (0.2 = 20%%)")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    # O ambiente precisa estar pronto antes de importar os módulos do servidor
+    os.environ["DATABASE_URL"] = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.sqlite")
+    os.environ["DATABASE_REPLICA_URLS"] = ""
+    os.environ["DB_ASYNC"] = "true" if args.async_db else "false"
+    os.environ["AUTH_TOKEN"] = TOKEN
+    if args.cold:
+        os.environ["CACHE_TTL"] = "0"
+
+    start = time.perf_counter()
+    corpus = load_corpus() if args.skip_seed else seed_corpus(args)
+    print(f"Corpus: {len(corpus['post_ids'])} posts, {len(corpus['category_ids'])} categorias, "
+          f"{len(corpus['option_ids'])} opções de tag ({time.perf_counter() - start:.1f}s)")
+
+    modes = ("asgi", "uvicorn") if args.mode == "both" else (args.mode,)
+    report = {
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("database_url", "output", "baseline")},
+        "results": {},
+    }
+    for mode in modes:
+        print(f"\n[{mode}] concorrência {args.concurrency}{' (cache desligado)' if args.cold else ''}")
+        runner = run_asgi if mode == "asgi" else run_uvicorn
+        report["results"][mode] = asyncio.run(runner(corpus, args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    print()
+    # Só faz sentido comparar execuções com o mesmo corpus e a mesma carga
+    different = sorted(key for key in COMPARABLE_CONFIG if baseline.get("config", {}).get(key) != report["config"][key])
+    if different:
+        print(f"AVISO: configuração diferente da referência em {', '.join(different)}")
+    regressions = compare(report, baseline, args.metric, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSÃO {regression}")
+    print("Sem regressões em relação à referência." if not regressions else f"{len(regressions)} regressão(ões).")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
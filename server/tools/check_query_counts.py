@@ -0,0 +1,97 @@
+"""
+Confere que as leituras de posts custam um número constante de queries,
+independente de quantos posts/tags existem (proteção contra N+1).
+
+Uso (na pasta server):  python tools/check_query_counts.py
+Roda em um SQLite temporário próprio; não toca no banco configurado no .env.
+"""
+import os
+import sys
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "query_counts.sqlite")
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["DB_ASYNC"] = "false"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Base, SessionLocal, get_engine, count_queries  # noqa: E402
+from models import Category, Post, TagOption, TagType  # noqa: E402
+import crud  # noqa: E402
+import search  # noqa: E402
+
+engine = get_engine()
+
+# Máximo de queries por leitura: posts + categorias + opções de tag (+ busca das categorias pelo nome)
+BUDGETS = {
+    "get_posts": 3,
+    "get_posts (busca)": 4,
+    "get_posts_by_categories": 3,
+    "get_post_by_id": 2,
+}
+
+
+def seed(db, total: int):
+    categories = [Category(name=f"Categoria {index}") for index in range(5)]
+    tag_type = TagType(name="Nível", is_mandatory=False)
+    options = [TagOption(name=f"Opção {index}", tag_type=tag_type) for index in range(5)]
+    db.add_all(categories + [tag_type])
+    db.flush()
+
+    posts = []
+    for index in range(total):
+        posts.append(Post(
+            title=f"Post {index}",
+            content="{}",
+            plain_text=f"texto do post {index}",
+            excerpt=f"texto do post {index}",
+            category=categories[index % len(categories)],
+            tag_options=[options[index % len(options)], options[(index + 1) % len(options)]]
+        ))
+    db.add_all(posts)
+    db.flush()
+    search.index_posts(db, [(post.id, post.title, post.plain_text) for post in posts])
+    db.commit()
+    return [category.id for category in categories], db.query(Post.id).first()[0]
+
+
+def measure(total: int) -> dict:
+    # Banco do zero a cada medição
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    search.create_index(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DELETE FROM {search.FTS_TABLE}")
+
+    db = SessionLocal()
+    try:
+        category_ids, post_id = seed(db, total)
+        calls = {
+            "get_posts": lambda: crud.get_posts(db, limit=100),
+            "get_posts (busca)": lambda: crud.get_posts(db, "post", limit=100),
+            "get_posts_by_categories": lambda: crud.get_posts_by_categories(db, category_ids, limit=100),
+            "get_post_by_id": lambda: crud.get_post_by_id(db, post_id),
+        }
+        counts = {}
+        for name, call in calls.items():
+            call()  # aquece caches (ex.: detecção da tabela FTS)
+            db.expire_all()
+            with count_queries(engine) as counter:
+                call()
+            counts[name] = counter["count"]
+        return counts
+    finally:
+        db.close()
+
+
+def main() -> int:
+    small, large = measure(5), measure(100)
+    failed = False
+    for name, budget in BUDGETS.items():
+        ok = small[name] == large[name] <= budget
+        failed = failed or not ok
+        print(f"{'ok  ' if ok else 'FALHOU'} {name}: {small[name]} queries (5 posts), {large[name]} queries (100 posts), limite {budget}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
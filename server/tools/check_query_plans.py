@@ -0,0 +1,232 @@
+"""
+Roda EXPLAIN em cada statement que as funções do crud enviam ao banco, sobre um corpus
+populado, e falha se alguma tabela for lida por varredura completa (sequential scan)
+onde deveria haver índice.
+
+Uso (na pasta server):
+    python tools/check_query_plans.py                                  # SQLite temporário
+    python tools/check_query_plans.py --database-url postgresql://...  # Postgres vazio (aplica as migrations)
+    python tools/check_query_plans.py -v                               # mostra os planos
+
+No SQLite procura "SCAN <tabela>" sem índice no EXPLAIN QUERY PLAN. No Postgres roda com
+enable_seqscan=off (em tabelas pequenas o planner prefere varrer mesmo com índice): se ainda
+assim sair um Seq Scan, não existe índice que sirva para a consulta.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# Varreduras esperadas por consulta: leituras da tabela inteira por definição (árvore, lista
+# de tags, contagens dos facets), a primeira página por id (para no LIMIT) e o ILIKE '%termo%'
+# no nome das categorias, que nenhum índice B-tree atende
+ALLOWED_SCANS = {
+    "get_categories_tree": {"categories"},
+    "get_tags": {"tag_types"},
+    "get_facets": {"categories", "tag_options", "posts", "post_tag_options"},
+    "get_facets (rollup)": {"categories", "tag_options", "posts", "post_tag_options", "category_closure"},
+    "get_posts": {"posts"},
+    "get_posts (busca)": {"categories"},
+    "get_posts (busca, cursor)": {"categories"},
+}
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Banco vazio (padrão: SQLite temporário)")
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser.parse_args()
+
+
+#! ------------------------- BANCO -------------------------
+def prepare_schema(engine):
+    # Postgres: o schema de produção, pelas migrations. SQLite: direto dos modelos
+    # (as migrations antigas não rodam no SQLite)
+    if engine.dialect.name == "sqlite":
+        from database import Base
+        import search
+
+        Base.metadata.create_all(bind=engine)
+        search.create_index(engine)
+        return
+
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(SERVER_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(SERVER_DIR, "migrations"))
+    config.set_main_option("sqlalchemy.url", engine.url.render_as_string(hide_password=False).replace("%", "%%"))
+    command.upgrade(config, "head")
+
+
+def seed(db, total: int) -> dict:
+    from schemas import CategoryImport, TagImport, TagOptionImport, PostImport
+    import crud
+
+    def run(resource, rows):
+        _, errors = crud.bulk_import(db, resource, list(enumerate(rows, start=1)))
+        if errors:
+            raise SystemExit(f"Falha ao popular {resource} (o banco precisa estar vazio): {errors[:3]}")
+
+    # Três níveis de categorias: 5 raízes, 20 filhas, 40 netas
+    run("categories", [CategoryImport(id=index, name=f"Categoria {index}") for index in range(1, 6)])
+    run("categories", [CategoryImport(id=index, name=f"Categoria {index}", parent_id=(index - 6) % 5 + 1)
+                       for index in range(6, 26)])
+    run("categories", [CategoryImport(id=index, name=f"Categoria {index}", parent_id=(index - 26) % 20 + 6)
+                       for index in range(26, 66)])
+    run("tags", [
+        TagImport(id=tag_id, name=f"Tipo {tag_id}",
+                  options=[TagOptionImport(id=(tag_id - 1) * 5 + index, name=f"Opção {index}") for index in range(1, 6)])
+        for tag_id in range(1, 5)
+    ])
+    content = json.dumps({"root": {"type": "root", "children": [
+        {"type": "paragraph", "children": [{"type": "text", "text": "texto de exemplo sobre python e bancos"}]}
+    ]}})
+    run("posts", [
+        PostImport(id=index, title=f"Post {index}", content=content, category_id=index % 65 + 1,
+                   tag_option_ids=[index % 20 + 1, (index + 7) % 20 + 1])
+        for index in range(1, total + 1)
+    ])
+    # Cada post tem as opções n e n + 7 (módulo 20): 3 e 10 aparecem juntas em vários posts,
+    # então o modo "all" passa pelo GROUP BY/HAVING com linhas de verdade
+    return {"leaf_category": 65, "tag_id": 4, "tag_pair": [3, 10]}
+
+
+#! ------------------------- PLANOS -------------------------
+def explain(connection, statement: str, parameters) -> tuple[list[str], set]:
+    # Devolve (linhas do plano, tabelas lidas por varredura completa)
+    if isinstance(parameters, list):
+        parameters = parameters[0] if parameters else ()
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        lines = [row[-1] for row in rows]
+        # Subconsultas (CO-ROUTINE/MATERIALIZE) também aparecem como SCAN, mas não são tabelas
+        derived = {line.split()[-1] for line in lines if line.startswith(("CO-ROUTINE ", "MATERIALIZE "))}
+        return lines, {match.group(1) for match in map(_SQLITE_SCAN.match, lines) if match} - derived
+
+    plan = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    lines, scans = [], set()
+
+    def walk(node, depth=0):
+        relation = node.get("Relation Name")
+        lines.append("  " * depth + node["Node Type"] + (f" on {relation}" if relation else ""))
+        if node["Node Type"] == "Seq Scan":
+            scans.add(relation)
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    walk(plan[0]["Plan"])
+    return lines, scans
+
+
+def capture(engine, call) -> list:
+    # Statements (e parâmetros) que a chamada enviou ao banco, na ordem
+    from sqlalchemy import event
+
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", collect)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", collect)
+    return statements
+
+
+def checks(seeded: dict) -> list:
+    from schemas import CategoryUpdate, PostUpdate
+    import crud
+
+    leaf, tag_id, tag_pair = seeded["leaf_category"], seeded["tag_id"], seeded["tag_pair"]
+    post_update = PostUpdate(title="Editado", content="{}", category_id=7, tag_option_ids=[1, 2])
+    # Leituras primeiro; as escritas alteram o corpus e vêm no fim
+    return [
+        ("get_categories_tree", lambda db: crud._build_categories_tree(db)),
+        ("get_category_breadcrumbs", lambda db: crud.get_category_breadcrumbs(db, leaf)),
+        ("get_tags", lambda db: crud.get_tags(db)),
+        ("get_versions", lambda db: crud.get_versions(db, "posts", "categories", "tags")),
+        ("get_facets", lambda db: crud._build_facets(db, False)),
+        ("get_facets (rollup)", lambda db: crud._build_facets(db, True)),
+        ("get_posts", lambda db: crud.get_posts(db, limit=20)),
+        ("get_posts (cursor)", lambda db: crud.get_posts(db, limit=20, after=200)),
+        ("get_posts (busca)", lambda db: crud.get_posts(db, "python", limit=20)),
+        ("get_posts (busca, cursor)", lambda db: crud.get_posts(db, "python", limit=20, after=200)),
+        ("get_posts (categorias)", lambda db: crud.get_posts(db, limit=20, category_ids=[leaf])),
+        ("get_posts (subárvore)", lambda db: crud.get_posts(db, limit=20, category_ids=[1], include_descendants=True)),
+        ("get_posts (tags any)", lambda db: crud.get_posts(db, limit=20, tag_option_ids=[3, 4])),
+        ("get_posts (tags all)", lambda db: crud.get_posts(db, limit=20, tag_option_ids=tag_pair, tag_mode="all")),
+        ("get_posts_by_categories", lambda db: crud.get_posts_by_categories(db, [leaf], limit=20)),
+        ("get_post_by_id", lambda db: crud.get_post_by_id(db, 10)),
+        ("get_post_details", lambda db: crud.get_post_details(db, [10, 11, 12])),
+        ("export_categories", lambda db: crud.export_categories(db, 0)),
+        ("export_posts", lambda db: crud.export_posts(db, 0)),
+        ("get_change_feed", lambda db: crud.get_change_feed(db, 10, 100)),
+        ("update_post", lambda db: crud.update_post(db, 10, post_update)),
+        ("update_category", lambda db: crud.update_category(db, leaf, CategoryUpdate(name="Movida", parent_id=2))),
+        ("delete_post", lambda db: crud.delete_post(db, 11)),
+        ("delete_tag", lambda db: crud.delete_tag(db, tag_id)),
+        ("delete_category", lambda db: crud.delete_category(db, 1)),
+    ]
+
+
+def main() -> int:
+    args = parse_args()
+    os.environ["DATABASE_URL"] = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "query_plans.sqlite")
+    os.environ["DATABASE_REPLICA_URLS"] = ""
+    os.environ["DB_ASYNC"] = "false"
+
+    from database import SessionLocal, get_engine
+
+    engine = get_engine()
+    prepare_schema(engine)
+    db = SessionLocal()
+    try:
+        # Sem ANALYZE de propósito: sem estatísticas o SQLite supõe tabelas grandes e usa
+        # qualquer índice que sirva, então o plano mostra se o índice existe, não o tamanho do corpus
+        seeded = seed(db, args.posts)
+
+        failed = False
+        for name, call in checks(seeded):
+            statements = capture(engine, lambda: call(db))
+            db.rollback()
+            allowed = ALLOWED_SCANS.get(name, set())
+            problems = []
+            with engine.connect() as conn:
+                if conn.dialect.name == "postgresql":
+                    conn.exec_driver_sql("SET enable_seqscan = off")
+                for statement, parameters in statements:
+                    if not statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE", "INSERT INTO")):
+                        continue
+                    lines, scans = explain(conn, statement, parameters)
+                    unexpected = scans - allowed
+                    if unexpected:
+                        problems.append((statement, lines, unexpected))
+                    elif args.verbose:
+                        print(f"  {' '.join(statement.split())[:120]}\n    " + "\n    ".join(lines))
+                conn.rollback()
+
+            failed = failed or bool(problems)
+            print(f"{'FALHOU' if problems else 'ok  '} {name}: {len(statements)} statements")
+            for statement, lines, unexpected in problems:
+                print(f"  varredura completa em {', '.join(sorted(unexpected))}:\n  {' '.join(statement.split())[:300]}")
+                print("    " + "\n    ".join(lines))
+        return 1 if failed else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
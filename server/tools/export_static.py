@@ -0,0 +1,248 @@
+"""
+Gera um snapshot estático da API de leitura (árvore de categorias, tags, páginas de posts
+geral e por categoria e um JSON por post) para servir direto de um bucket/CDN.
+
+Uso (na pasta server):
+    python tools/export_static.py --output ../static         # incremental
+    python tools/export_static.py --output ../static --full  # regera tudo
+
+Cada arquivo tem o hash do conteúdo no nome (posts/12.3fa9c0d1e2b4a5f6.json) e vai junto
+com as versões .gz e .br; pode ser servido com cache imutável. O ponto de entrada é o
+manifest.json (sem hash, cache curto), que liga o caminho lógico ao arquivo atual:
+    {"files": {"categories.json": "categories.<hash>.json", "posts/12.json": ..., ...}}
+
+As páginas têm o mesmo formato das respostas da API; nas listas, next_cursor é o número
+da próxima página (posts/page-2.json, categories/5/page-2.json).
+
+Incremental: o manifest guarda o último evento do feed de alterações (change_events). Na
+rodada seguinte só os posts alterados desde então são lidos e renderizados de novo; os
+arquivos agregados são remontados, mas só gravados quando o conteúdo muda. Sem cursor
+(primeira rodada) ou com o cursor fora da retenção do feed, tudo é regerado.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele só as versões .gz são geradas
+    brotli = None
+
+MANIFEST = "manifest.json"
+# Posts lidos do banco por vez
+CHUNK_SIZE = 500
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help="Pasta do snapshot")
+    parser.add_argument("--database-url", help="Banco de origem (padrão: DATABASE_URL do .env)")
+    parser.add_argument("--page-size", type=int, default=None, help="Posts por página (padrão: o da API)")
+    parser.add_argument("--full", action="store_true", help="Regera todos os posts, sem consultar o feed de alterações")
+    return parser.parse_args()
+
+
+#! ------------------------- ARQUIVOS -------------------------
+class Snapshot:
+    # Arquivos do snapshot: grava só o que mudou e lembra o que continua publicado
+
+    def __init__(self, output: str, previous: dict):
+        self.output = output
+        self.previous = previous.get("files", {})
+        self.files = {}
+        self.written = 0
+
+    def put(self, logical: str, body: bytes):
+        stem, extension = os.path.splitext(logical)
+        name = f"{stem}.{hashlib.sha256(body).hexdigest()[:16]}{extension}"
+        self.files[logical] = name
+        path = os.path.join(self.output, name)
+        if os.path.exists(path):
+            return
+        _write(path, body)
+        self.written += 1
+
+    def keep(self, logical: str):
+        # Arquivo que não precisou ser remontado nesta rodada
+        if logical in self.previous:
+            self.files[logical] = self.previous[logical]
+
+    def stale(self) -> set:
+        return set(self.previous.values()) - set(self.files.values())
+
+
+def _write(path: str, body: bytes):
+    # Original + versões pré-comprimidas (o servidor/CDN escolhe pelo Accept-Encoding)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    versions = {path: body, path + ".gz": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        versions[path + ".br"] = brotli.compress(body, quality=11)
+    for target, data in versions.items():
+        temporary = target + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, target)
+
+
+def _remove(output: str, name: str):
+    for suffix in ("", ".gz", ".br"):
+        try:
+            os.remove(os.path.join(output, name + suffix))
+        except FileNotFoundError:
+            pass
+
+
+def load_manifest(output: str) -> dict:
+    try:
+        with open(os.path.join(output, MANIFEST), "rb") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+#! ------------------------- CONTEÚDO -------------------------
+def changed_posts(db, since: int, until: int):
+    # Ids dos posts a regerar desde o cursor, ou None quando é preciso regerar todos
+    from models import Post
+    import crud
+
+    # Cursor além da marca d'água do feed (banco restaurado/trocado): não há como provar
+    # continuidade, então regera tudo. Antes do evento mais antigo, o feed devolve reset
+    if since > until:
+        return None
+
+    post_ids, category_ids = set(), set()
+    while since < until:
+        feed = crud.get_change_feed(db, since, CHUNK_SIZE)
+        if feed.reset:
+            return None
+        for event in feed.events:
+            if event.id > until:
+                break
+            if event.resource == "posts":
+                post_ids.add(event.resource_id)
+            elif event.resource == "categories":
+                # A categoria vai embutida em cada post dela
+                category_ids.add(event.resource_id)
+            elif event.resource == "tags":
+                # Opções de tag também vão embutidas; tag apagada não deixa rastro nos posts
+                return None
+        if not feed.events:
+            break
+        since = feed.last_id
+
+    if category_ids:
+        post_ids.update(post_id for (post_id,) in db.query(Post.id).filter(Post.category_id.in_(category_ids)))
+    return post_ids
+
+
+def export(db, snapshot: Snapshot, page_size: int, post_ids) -> dict:
+    from typing import List
+    from responses import _adapter
+    from schemas import CategoryResponse, PostDetail, PostPage, TagResponse
+    import crud
+
+    def dump(model_type, value) -> bytes:
+        # Mesmo serializer (em cache por tipo) e mesmos bytes da resposta da API
+        adapter = _adapter(model_type)
+        return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+    snapshot.put("categories.json", dump(List[CategoryResponse], crud.get_categories_tree(db)))
+    snapshot.put("tags.json", dump(List[TagResponse], crud.get_tags(db)))
+
+    # Listagem completa, do mais novo para o mais antigo (a mesma ordem da API), em blocos
+    items, after = [], None
+    while True:
+        page = crud.get_posts(db, limit=CHUNK_SIZE, after=after)
+        items += page.items
+        if page.next_cursor is None:
+            break
+        after = page.next_cursor
+
+    def paginate(prefix: str, listing: list):
+        pages = [listing[start:start + page_size] for start in range(0, len(listing), page_size)] or [[]]
+        for number, page_items in enumerate(pages, start=1):
+            next_page = number + 1 if number < len(pages) else None
+            snapshot.put(f"{prefix}page-{number}.json", dump(PostPage, PostPage(items=page_items, next_cursor=next_page)))
+
+    paginate("posts/", items)
+    by_category = {}
+    for item in items:
+        by_category.setdefault(item.category_id, []).append(item)
+    for category_id, listing in by_category.items():
+        if category_id is not None:
+            paginate(f"categories/{category_id}/", listing)
+
+    # Um arquivo por post: os não alterados continuam com o arquivo da rodada anterior
+    existing = [item.id for item in items]
+    rebuild = []
+    for post_id in existing:
+        logical = f"posts/{post_id}.json"
+        if post_ids is None or post_id in post_ids or logical not in snapshot.previous:
+            rebuild.append(post_id)
+        else:
+            snapshot.keep(logical)
+    for start in range(0, len(rebuild), CHUNK_SIZE):
+        for post in crud.get_post_details(db, rebuild[start:start + CHUNK_SIZE]):
+            snapshot.put(f"posts/{post.id}.json", dump(PostDetail, post))
+
+    return {"posts": len(existing), "rendered": len(rebuild)}
+
+
+#! ------------------------- MAIN -------------------------
+def main() -> int:
+    args = parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ["DATABASE_REPLICA_URLS"] = ""
+    os.environ["DB_ASYNC"] = "false"
+
+    from database import SessionLocal, get_engine
+    import crud
+
+    get_engine()
+    output = os.path.abspath(args.output)
+    previous = load_manifest(output)
+    snapshot = Snapshot(output, previous)
+    page_size = args.page_size or crud.POSTS_PAGE_SIZE
+
+    db = SessionLocal()
+    try:
+        # Cursor lido antes do conteúdo: o que mudar durante a exportação entra na próxima rodada
+        until = crud.get_change_feed(db, None, 1).last_id
+        since = previous.get("last_change_id")
+        if args.full or previous.get("page_size") != page_size:
+            since = None
+        post_ids = None if since is None else changed_posts(db, since, until)
+        counts = export(db, snapshot, page_size, post_ids)
+    finally:
+        db.close()
+
+    manifest = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "last_change_id": until,
+        "page_size": page_size,
+        "files": dict(sorted(snapshot.files.items())),
+    }
+    _write(os.path.join(output, MANIFEST), json.dumps(manifest, ensure_ascii=False, indent=1).encode())
+
+    # Arquivos que saíram do manifest (post apagado, conteúdo antigo) só depois do manifest novo
+    stale = snapshot.stale()
+    for name in stale:
+        _remove(output, name)
+
+    mode = "completo" if post_ids is None else "incremental"
+    print(f"Snapshot {mode} em {output}: {counts['posts']} posts, {counts['rendered']} renderizados, "
+          f"{snapshot.written} arquivos gravados, {len(stale)} removidos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())